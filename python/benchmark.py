@@ -0,0 +1,233 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import example_load_data_tables, example_load_decrement_tables, setup, slope_api
+from mock_server import MockServerConfig, MockSlopeServer
+
+# Benchmarks for the SlopeApi client against the local stand-in server in mock_server.py.
+# Nothing here talks to the real SLOPE service, so the results are repeatable and can be run offline.
+#
+#   python benchmark.py                          Run all benchmarks and print the results
+#   python benchmark.py --output results.json    Save the results
+#   python benchmark.py --baseline results.json  Compare against saved results and fail on regressions
+
+loader_table_count = 20
+loader_table_rows = 2000
+upload_file_size = 1024 * 1024
+
+
+def write_csv(folder: str, name: str, rows: int) -> str:
+    path = os.path.join(folder, name)
+    with open(path, "w") as file:
+        file.write("ID,Age,Rate\n")
+        for r in range(rows):
+            file.write(f"Plan {r % 25},{r % 121},{(r % 1000) / 1000}\n")
+    return path
+
+
+def connect() -> slope_api.SlopeApi:
+    api = slope_api.SlopeApi()
+    api.authorize("benchmark", "benchmark")
+    return api
+
+
+def measure(name: str, server: MockSlopeServer, func, repeat: int, expect_errors: bool = False) -> dict:
+    """Call 'func' repeat times and return timing and server traffic statistics.
+    'expect_errors' marks runs where failed calls are the point of the benchmark (rate limiting), see failures()."""
+    errors = []
+    previous_hook = threading.excepthook
+    threading.excepthook = lambda args: errors.append(args.exc_value)
+    server.reset_stats()
+    durations = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                errors.append(e)
+            durations.append(time.perf_counter() - start)
+    finally:
+        threading.excepthook = previous_hook
+    stats = server.stats()
+    result = {
+        "name": name,
+        "runs": repeat,
+        "mean_seconds": statistics.mean(durations),
+        "p50_seconds": statistics.median(durations),
+        "max_seconds": max(durations),
+        "requests": stats["requests"] / repeat,
+        "connections": stats["connections"] / repeat,
+        "bytes_in": stats["bytes_in"] / repeat,
+        "bytes_out": stats["bytes_out"] / repeat,
+        "rate_limited": stats["rate_limited"],
+        "errors": len(errors),
+        "expect_errors": expect_errors,
+    }
+    logging.info(f"{name}: {result['mean_seconds'] * 1000:.1f} ms mean over {repeat} runs")
+    return result
+
+
+def benchmark_data_table(repeat: int) -> list:
+    config = MockServerConfig(latency_seconds=0.005, data_table_rows=50000, data_table_page_rows=10000, list_item_count=10)
+    with MockSlopeServer(config) as server:
+        slope_api.SlopeApi.api_url = server.api_url
+        api = connect()
+        data_table_id = api.list_data_tables(server.model_id)[0]["id"]
+        api.get_data_table_by_id(data_table_id)   # Build the server side table before timing
+        return [measure("get_data_table_by_id (50k rows, 5 pages)", server, lambda: api.get_data_table_by_id(data_table_id), repeat)]
+
+
+def benchmark_pagination(repeat: int) -> list:
+    results = []
+    for page_size in [50, 200]:
+        config = MockServerConfig(latency_seconds=0.005, page_size=page_size, list_item_count=2000)
+        with MockSlopeServer(config) as server:
+            slope_api.SlopeApi.api_url = server.api_url
+            api = connect()
+            results.append(measure(f"list_data_tables (2000 items, page size {page_size})", server,
+                                   lambda: api.list_data_tables(server.model_id), repeat))
+            results.append(measure(f"list_decrement_tables (2000 items, page size {page_size})", server,
+                                   lambda: api.list_decrement_tables(server.model_id), repeat))
+            results.append(measure(f"get_scenario_tables (2000 items, page size {page_size})", server,
+                                   lambda: api.get_scenario_tables(server.model_id), repeat))
+
+    # Every call refreshes the token when it is issued with less than the 5 minute refresh margin
+    config = MockServerConfig(latency_seconds=0.005, page_size=200, list_item_count=2000, token_lifetime_seconds=290)
+    with MockSlopeServer(config) as server:
+        slope_api.SlopeApi.api_url = server.api_url
+        api = connect()
+        results.append(measure("list_data_tables (2000 items, token refresh each call)", server,
+                               lambda: api.list_data_tables(server.model_id), repeat))
+    return results
+
+
+def benchmark_upload(repeat: int, folder: str) -> list:
+    path = os.path.join(folder, "upload.bin")
+    with open(path, "wb") as file:
+        file.write(os.urandom(upload_file_size))
+    with MockSlopeServer(MockServerConfig(latency_seconds=0.005, list_item_count=10)) as server:
+        slope_api.SlopeApi.api_url = server.api_url
+        api = connect()
+        return [measure("upload_file (1 MiB)", server, lambda: api.upload_file(path, "benchmark/upload.bin"), repeat)]
+
+
+def benchmark_report(repeat: int, folder: str) -> list:
+    results = []
+    path = os.path.join(folder, "report.csv")
+    for delay in [0.0, 0.5]:
+        config = MockServerConfig(latency_seconds=0.005, report_delay_seconds=delay, report_rows=50000, list_item_count=10)
+        with MockSlopeServer(config) as server:
+            slope_api.SlopeApi.api_url = server.api_url
+            api = connect()
+            api.report_poll_seconds = 0.1
+            results.append(measure(f"download_report (50k rows, {delay}s generation)", server,
+                                   lambda: api.download_report("workbook", "element", path, "Csv", {"Projection-ID": "1"}), repeat))
+    return results
+
+
+def benchmark_loaders(repeat: int, folder: str) -> list:
+    results = []
+    data_tables = [{"name": f"Bench Table {i}", "path": write_csv(folder, f"table_{i}.csv", loader_table_rows), "structure": 100}
+                   for i in range(loader_table_count)]
+    decrement_tables = [{"name": f"Bench Decrement {i}.csv", "path": table["path"], "sheet": "", "type": "Standard",
+                         "year": 2020, "frequency": "Annual"} for i, table in enumerate(data_tables)]
+    example_load_decrement_tables.tables = decrement_tables
+
+    label = f"{loader_table_count} tables"
+    config = MockServerConfig(latency_seconds=0.02, list_item_count=10)
+    with MockSlopeServer(config) as server:
+        slope_api.SlopeApi.api_url = server.api_url
+        for loader in [example_load_data_tables.load_data_tables, example_load_data_tables.load_data_tables_parallel]:
+            run = iter(range(repeat))
+
+            # Table names have to be unique for each run or the server will reject them as duplicates
+            def load(loader=loader, run=run):
+                n = next(run)
+                example_load_data_tables.tables = [dict(t, name=f"{t['name']} {loader.__name__} {n}") for t in data_tables]
+                loader()
+            results.append(measure(f"{loader.__name__} ({label})", server, load, repeat))
+        for loader in [example_load_decrement_tables.load_decrement_tables, example_load_decrement_tables.load_decrement_tables_parallel]:
+            results.append(measure(f"{loader.__name__} ({label})", server, loader, repeat))
+
+    # Records how many calls get a 429 (with Retry-After) when the parallel loader exceeds the rate limit.
+    # SlopeApi does not retry 429 responses, so those calls fail: the errors are expected and the timing is not compared
+    config = MockServerConfig(latency_seconds=0.02, list_item_count=10, rate_limit_per_second=50)
+    with MockSlopeServer(config) as server:
+        slope_api.SlopeApi.api_url = server.api_url
+        loader = example_load_decrement_tables.load_decrement_tables_parallel
+        results.append(measure(f"{loader.__name__} ({label}, rate limit 50/s)", server, loader, repeat, expect_errors=True))
+    return results
+
+
+def failures(results: list) -> list:
+    """Return the names of benchmarks with failed calls. A run that fails can finish sooner, so its timing means nothing."""
+    failed = [result["name"] for result in results if result["errors"] and not result.get("expect_errors")]
+    for name in failed:
+        print(f"Failed calls in '{name}'")
+    return failed
+
+
+def compare(results: list, baseline_file: str, tolerance: float) -> list:
+    """Return the names of benchmarks that have more errors than the baseline, or are slower than it by more than the tolerance.
+    Benchmarks where errors are expected (rate limiting) are only reported, not compared."""
+    with open(baseline_file) as file:
+        baseline = {result["name"]: result for result in json.load(file)}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["name"])
+        if previous is None or result.get("expect_errors"):
+            continue
+        if result["errors"] > previous["errors"]:
+            regressions.append(result["name"])
+            print(f"Regression: '{result['name']}' has {result['errors']} errors, the baseline had {previous['errors']}")
+            continue
+        change = result["mean_seconds"] / previous["mean_seconds"] - 1
+        if change > tolerance:
+            regressions.append(result["name"])
+            print(f"Regression: '{result['name']}' is {change:.0%} slower than the baseline")
+    return regressions
+
+
+def print_results(results: list):
+    print(f"{'Benchmark':<70} {'Mean ms':>10} {'P50 ms':>10} {'Requests':>9} {'Conns':>6} {'KiB out':>10} {'429s':>6} {'Errors':>7}")
+    for r in results:
+        print(f"{r['name']:<70} {r['mean_seconds'] * 1000:>10.1f} {r['p50_seconds'] * 1000:>10.1f} {r['requests']:>9.0f} "
+              f"{r.get('connections', 0):>6.0f} {r['bytes_out'] / 1024:>10.1f} {r['rate_limited']:>6} {r['errors']:>7}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the SLOPE API client against a local mock server.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times to run each benchmark")
+    parser.add_argument("--output", help="Save the results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Failed calls are counted in the results instead of logged
+    setup.setup_logging(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as folder:
+        results = []
+        results += benchmark_data_table(args.repeat)
+        results += benchmark_pagination(args.repeat)
+        results += benchmark_upload(args.repeat, folder)
+        results += benchmark_report(args.repeat, folder)
+        results += benchmark_loaders(args.repeat, folder)
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        if compare(results, args.baseline, args.tolerance):
+            raise SystemExit(1)
+    elif failures(results):
+        raise SystemExit(1)
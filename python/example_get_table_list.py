@@ -1,5 +1,5 @@
 import logging
-import keys, setup, slope_api
+import keys, model_catalog, setup, slope_api
 
 model_id = 11759
 table_structure_id = 293310
@@ -27,3 +27,10 @@ if __name__ == '__main__':
     # Get a List of all Table Structures on a Model
     tables = api.list_table_structures(model_id)
 
+    # Load everything on the model at once (in parallel) for repeated lookups by name or ID
+    catalog = model_catalog.ModelCatalog(api, model_id)
+    table_structure = catalog.find("table_structures", table_structure_name)
+    tables = catalog.records("data_tables")
+
+    # Re-fetch only the data tables after they have changed
+    catalog.refresh(["data_tables"])
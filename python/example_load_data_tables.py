@@ -1,6 +1,6 @@
 import threading
 import logging
-import keys, setup, slope_api
+import keys, setup, slope_api, table_validation
 
 # the following list contains sets of data to load to SLOPE with the following format
 # {
@@ -33,8 +33,8 @@ def load_data_tables():
 # Multi-Threaded table load. This will load multiple tables in parallel into SLOPE.
 # For large sets of tables, this is faster. Be sure to consider table size and network bandwidth.
 def load_data_tables_parallel():
-    # Connect SLOPE API
-    api_client = slope_api.SlopeApi()
+    # Connect SLOPE API. Keep a connection open for each thread so every file does not open a new connection
+    api_client = slope_api.SlopeApi(max_connections=len(tables))
     api_client.authorize(keys.api_key, keys.api_secret)
 
     loader_threads = []
@@ -57,6 +57,29 @@ def load_data_tables_parallel():
         thread.join()
 
 
+# Check every file against its table structure before uploading anything, so a malformed file fails in seconds
+# instead of after the upload. The files are checked in parallel and all problems are reported together.
+def load_data_tables_validated():
+    api_client = slope_api.SlopeApi()
+    api_client.authorize(keys.api_key, keys.api_secret)
+
+    uploads = []
+    for table in tables:
+        data_table_parameters = {
+            "tableStructureId": table["structure"],
+            "name": table["name"],
+            "filePath": f'api/{table["name"]}.csv',
+            "delimiter": ","
+        }
+        uploads.append({"path": table["path"], "params": data_table_parameters})
+
+    # Raises a TableValidationError listing the problems in every file
+    table_validation.TableValidator(api_client).validate_batch(uploads)
+
+    for upload in uploads:
+        api_client.create_data_table(upload["path"], upload["params"])
+
+
 if __name__ == '__main__':
     # Change this to appropriate level for your run
     setup.setup_logging(logging.INFO)
@@ -1,6 +1,6 @@
 import threading
 import logging
-import keys, setup, slope_api
+import keys, excel_convert, setup, slope_api
 
 # the following list contains sets of data to load to SLOPE with the following format
 # {
@@ -41,7 +41,8 @@ def load_decrement_tables():
 # Multi-Threaded table load. This will load multiple tables in parallel into SLOPE.
 # For large sets of tables, this is faster. Be sure to consider table size and network bandwidth.
 def load_decrement_tables_parallel():
-    api_client = slope_api.SlopeApi()
+    # Keep a connection open for each thread so every file does not open a new connection
+    api_client = slope_api.SlopeApi(max_connections=len(tables))
     api_client.authorize(keys.api_key, keys.api_secret)
 
     loader_threads = []
@@ -68,6 +69,38 @@ def load_decrement_tables_parallel():
         thread.join()
 
 
+# Converts the Excel sheets to CSV files locally first (in parallel, one process per workbook) and then loads the
+# tables in parallel. Only the referenced sheet is uploaded, which helps when loading many large workbooks.
+def load_decrement_tables_preconverted(conversion_folder: str = r'c:\api\converted'):
+    api_client = slope_api.SlopeApi(max_connections=len(tables))
+    api_client.authorize(keys.api_key, keys.api_secret)
+
+    uploads = []
+    for table in tables:
+        decrement_table_parameters = {
+            "modelId": modelId,
+            "name": table["name"],
+            "filePath": f'api/{table["name"]}',
+            "delimiter": ",",
+            "excelSheetName": table["sheet"],
+            "decrementTableType": table["type"],
+            "improvementBaseYear": table["year"],
+            'selectPeriodFrequency': table["frequency"]
+        }
+        uploads.append({"path": table["path"], "params": decrement_table_parameters})
+    uploads = excel_convert.convert_uploads(uploads, conversion_folder)
+
+    loader_threads = []
+    for upload in uploads:
+        thread = threading.Thread(target=api_client.create_decrement_table, args=(upload["path"], upload["params"]))
+        thread.start()
+        loader_threads.append(thread)
+
+    # Wait for all table loads to be done
+    for thread in loader_threads:
+        thread.join()
+
+
 if __name__ == '__main__':
     # Change this to appropriate level for your run
     setup.setup_logging(logging.INFO)
@@ -25,3 +25,11 @@ if __name__ == '__main__':
 
     print(table)
 
+    # Tables can also be read into NumPy structured arrays, Arrow tables or polars DataFrames instead of pandas.
+    # The library is only imported when a table is first read with it (pyarrow and polars have to be installed separately)
+    # table = api_client.get_data_table_by_id(data_table_id, backend="arrow")
+
+    # For large tables, "pandas_compact" returns a pandas DataFrame with smaller column types (see table_backends.py)
+    # table = api_client.get_data_table_by_id(data_table_id, backend="pandas_compact")
+    # print(table.attrs["memory_savings"])
+
@@ -0,0 +1,75 @@
+import datetime
+import logging
+import keys, pipeline, setup, slope_api
+
+# The same valuation as example_run_projection.py, described declaratively and run with pipeline.py.
+# The scenario table, data table and model point file uploads and the projection creation run in parallel.
+# If a step fails, run the script again: steps recorded in the checkpoint file are not repeated.
+
+model_id = 9999  # The ID of the model to be run
+workbook_id = "5rMaW9R0yVoehrIjyAUtew"  # The ID of the workbook with the element to download
+element_id = "SQ_fXFwL0L"  # The ID of the element in the workbook to download
+template_id = 9999  # The ID of the Projection Template to be run
+table_structure_id = 9999  # The ID of the table structure of the data table to create
+
+valuation_date = datetime.datetime(2021, 1, 31)  # The start date of the scenario table
+valuation_date_string = valuation_date.strftime("%Y-%m")
+
+checkpoint_file_path = rf"C:\Api\Valuation {valuation_date_string} checkpoint.json"
+# Excel sheets referenced by the data tables are converted to CSV files here before upload. Set to None to upload the workbooks
+excel_conversion_folder = r"C:\Api\Converted"
+
+spec = {
+    "scenario_tables": {
+        "scenarios": {
+            "path": r"C:\Api\Scenario.csv",
+            "params": {
+                "modelId": model_id,
+                "name": f"Scenarios {valuation_date_string}",
+                "startDate": valuation_date.isoformat(),
+                "yieldCurveRateType": "BondEquivalent",
+                "filePath": f"Scenario Files/Scenarios {valuation_date_string}.csv",
+                "delimiter": ","
+            },
+        },
+    },
+    "data_tables": {
+        "assumptions": {
+            "path": r"C:\Api\Assumption Update.xlsx",
+            "mode": "create_or_update",
+            "params": {
+                "tableStructureId": table_structure_id,
+                "name": f"Assumptions {valuation_date_string}",
+                "filePath": f"Assumptions/Assumption Update {valuation_date_string}.xlsx",
+                "excelSheetName": "Assumptions"
+            },
+        },
+    },
+    "model_point_files": {
+        "inforce": {"path": r"C:\Api\Inforce.csv", "slope_path": f"Inforce/Inforce File - {valuation_date_string}.csv"},
+    },
+    "projection": {
+        "template_id": template_id,
+        "name": f"Valuation {valuation_date_string}",
+        "properties": {"startDate": valuation_date.isoformat()},
+        "scenario_table": "scenarios",
+        "data_tables": {"Data Table Name": "assumptions"},
+        "model_point_files": [{"portfolio": "Portfolio 1", "product": "Product A", "file": "inforce"}],
+    },
+    "reports": {
+        "excel": {"workbook": workbook_id, "element": element_id, "filename": r"C:\Api\Results.xlsx", "format": "Excel"},
+        "csv": {"workbook": workbook_id, "element": element_id, "filename": r"C:\Api\Results.csv", "format": "Csv"},
+    },
+}
+
+
+if __name__ == '__main__':
+    # Change this to appropriate level for your run
+    setup.setup_logging(logging.INFO)
+
+    api_client = slope_api.SlopeApi()
+    api_client.authorize(keys.api_key, keys.api_secret)
+
+    # validate=True checks the data table files against their table structures before anything is uploaded
+    results = pipeline.run_pipeline(api_client, spec, checkpoint_file_path, excel_conversion_folder=excel_conversion_folder, validate=True)
+    logging.info(f"Projection ID {results['create_projection']} finished with status '{results['run_projection']}'")
@@ -1,7 +1,6 @@
 import datetime
-import time
 import logging
-import keys, slope_api, setup
+import keys, slope_api, setup, tracing
 
 model_id = 9999  # The ID of the model to be run
 workbook_id = "5rMaW9R0yVoehrIjyAUtew"  # The ID of the workbook with the element to download
@@ -24,61 +23,70 @@ valuation_date_string = valuation_date.strftime("%Y-%m")
 report_download_file_path_excel = r"C:\Api\Results.xlsx"
 report_download_file_path_csv = r"C:\Api\Results.csv"
 
+# Timing trace of the run. Open it in chrome://tracing or https://ui.perfetto.dev to see where the time is spent
+trace_file_path = r"C:\Api\Trace.json"
+
 
 if __name__ == '__main__':
     # Change this to appropriate level for your run
     setup.setup_logging(logging.INFO)
 
-    api_client = slope_api.SlopeApi()
+    tracer = tracing.Tracer()
+    api_client = slope_api.SlopeApi(tracer)
     api_client.authorize(keys.api_key, keys.api_secret)
 
     # Create Scenario File
-    scenario_table_parameters = {
-        "modelId": model_id,
-        "name": f"Scenarios {valuation_date_string}",
-        "startDate": valuation_date.isoformat(),
-        "yieldCurveRateType": "BondEquivalent",
-        "filePath": f"Scenario Files/Scenarios {valuation_date_string}.csv",
-        "delimiter": ","
-    }
-    scenario_table_id = api_client.create_scenario_table(scenario_table_file_path, scenario_table_parameters)
+    with tracer.span("Create Scenario Table", "workflow"):
+        scenario_table_parameters = {
+            "modelId": model_id,
+            "name": f"Scenarios {valuation_date_string}",
+            "startDate": valuation_date.isoformat(),
+            "yieldCurveRateType": "BondEquivalent",
+            "filePath": f"Scenario Files/Scenarios {valuation_date_string}.csv",
+            "delimiter": ","
+        }
+        scenario_table_id = api_client.create_scenario_table(scenario_table_file_path, scenario_table_parameters)
 
     # Update Assumptions
-    table_structures = api_client.list_table_structures(model_id)
-    logging.info("Listing Table Structures")
-    for d in table_structures:
-        logging.info(f"Id: {d['id']}, Name: {d['name']}, Description: {d['description']}")
-
-    data_table_parameters = {
-        "tableStructureId": table_structure_id,
-        "name": f"Assumptions {valuation_date_string}",
-        "filePath": f"Assumptions/Assumption Update {valuation_date_string}.xlsx",
-        "excelSheetName": data_table_file_excel_sheet_name
-    }
-    data_table_id = api_client.create_data_table(data_table_file_path, data_table_parameters)
-
-    data_tables = api_client.list_data_tables(model_id)
-    logging.info("Listing Data Tables")
-    for d in data_tables:
-        logging.info(f"Id: {d['id']}, Name: {d['name']}")
-
-    data_table_id = api_client.update_data_table(data_table_file_path, data_table_parameters)
+    with tracer.span("Update Assumptions", "workflow"):
+        table_structures = api_client.list_table_structures(model_id)
+        logging.info("Listing Table Structures")
+        for d in table_structures:
+            logging.info(f"Id: {d['id']}, Name: {d['name']}, Description: {d['description']}")
+
+        data_table_parameters = {
+            "tableStructureId": table_structure_id,
+            "name": f"Assumptions {valuation_date_string}",
+            "filePath": f"Assumptions/Assumption Update {valuation_date_string}.xlsx",
+            "excelSheetName": data_table_file_excel_sheet_name
+        }
+        data_table_id = api_client.create_data_table(data_table_file_path, data_table_parameters)
+
+        data_tables = api_client.list_data_tables(model_id)
+        logging.info("Listing Data Tables")
+        for d in data_tables:
+            logging.info(f"Id: {d['id']}, Name: {d['name']}")
+
+        data_table_id = api_client.update_data_table(data_table_file_path, data_table_parameters)
 
     # Upload New Inforce Files
-    model_point_file_id = api_client.upload_file(model_point_file_path, f"Inforce/Inforce File - {valuation_date_string}.csv")
+    with tracer.span("Upload Model Point File", "workflow"):
+        model_point_file_id = api_client.upload_file(model_point_file_path, f"Inforce/Inforce File - {valuation_date_string}.csv")
 
     # Create Projection from Template
-    projection_id = api_client.create_projection_from_template(template_id, f"Valuation {valuation_date_string}")
+    with tracer.span("Create Projection", "workflow"):
+        projection_id = api_client.create_projection_from_template(template_id, f"Valuation {valuation_date_string}")
 
     # Update Projection Properties
-    projection_update_parameters = {
-        "startDate": valuation_date.isoformat(),
-        "scenarioTableId": scenario_table_id
-    }
+    with tracer.span("Update Projection", "workflow"):
+        projection_update_parameters = {
+            "startDate": valuation_date.isoformat(),
+            "scenarioTableId": scenario_table_id
+        }
 
-    api_client.update_projection(projection_id, projection_update_parameters)
-    api_client.update_projection_table(projection_id, data_table_name, data_table_id)
-    api_client.update_projection_mpf(projection_id, model_point_portfolio_name, model_point_product_name, model_point_file_id)
+        api_client.update_projection(projection_id, projection_update_parameters)
+        api_client.update_projection_table(projection_id, data_table_name, data_table_id)
+        api_client.update_projection_mpf(projection_id, model_point_portfolio_name, model_point_product_name, model_point_file_id)
 
     # The projection can also be updated in a single call:
     #
@@ -101,17 +109,32 @@ if __name__ == '__main__':
     # }
     # api_client.update_projection(projection_id, projection_update_parameters)
 
-    # Start Projection and wait for it to finish
-    api_client.run_projection(projection_id)
+    # Start Projection. start_projection returns straight away with a handle to the run,
+    # whose status is checked in the background (every SlopeApi.projection_poll_seconds)
     logging.info("Starting Projection")
+    run = api_client.start_projection(projection_id)
+    run.on_status_change(lambda r, old_status, new_status: logging.info(f"Projection ID {r.projection_id}: {old_status} -> {new_status}"))
 
-    while api_client.is_projection_running(projection_id):
-        time.sleep(15)  # Check once every 15 seconds if it is done
-
-    status = api_client.get_projection_status(projection_id)
+    # Other work can be done here while the projection runs. Then wait for it to finish
+    with tracer.span("Run Projection", "workflow"):
+        status = run.wait()
     logging.info(f"Status: {status}")
 
     # Download Results
     if status in ["Completed", "CompletedWithErrors"]:
-        api_client.download_report(workbook_id, element_id, report_download_file_path_excel, "Excel", {"Projection-ID": f"{projection_id}"})
-        api_client.download_report(workbook_id, element_id, report_download_file_path_csv, "Csv", {"Projection-ID": f"{projection_id}"})
+        with tracer.span("Download Results", "workflow"):
+            run.result(workbook_id, element_id, report_download_file_path_excel, "Excel")
+            # Csv reports are also read into a pandas DataFrame
+            results = run.result(workbook_id, element_id, report_download_file_path_csv, "Csv")
+            logging.info(f"Downloaded {len(results)} result rows")
+
+    # Many projections can be run at the same time from an asyncio event loop. One thread checks the status of all of them:
+    #
+    # async def run_all(projection_ids):
+    #     runs = [api_client.start_projection(p) for p in projection_ids]
+    #     return await asyncio.gather(*(r.result_async(workbook_id, element_id, rf"C:\Api\Results {r.projection_id}.csv") for r in runs))
+    #
+    # all_results = asyncio.run(run_all([projection_id_1, projection_id_2]))
+
+    tracer.export_chrome_trace(trace_file_path)
+    logging.info(f"Timing trace saved to '{trace_file_path}'")
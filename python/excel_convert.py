@@ -0,0 +1,98 @@
+import csv
+import datetime
+import decimal
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from table_backends import require_optional
+
+# Converts the sheet referenced by 'excelSheetName' in data table and decrement table parameters to a CSV file
+# before upload, so only that sheet goes over the wire and SLOPE does not have to convert the workbook.
+# Workbooks are converted in a process pool because reading .xlsx files is CPU bound.
+
+excel_extensions = (".xlsx", ".xlsm")
+
+
+def _format_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float):
+        # str() switches to scientific notation for very small and large values (1e-07), write them out in full
+        return format(decimal.Decimal(repr(value)), "f")
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+        return value.date().isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def convert_sheet(excel_path: str, sheet_name: str, csv_path: str, delimiter: str = ",") -> str:
+    """Write one worksheet of a workbook to a delimited file.
+    The header (the first non-empty row) sets the number of columns: every row is padded or trimmed to it, so blank
+    cells at the end of a row are kept as empty fields. Empty rows at the end of the sheet are dropped."""
+    openpyxl = require_optional("openpyxl", "openpyxl", "Converting Excel files")
+    workbook = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name]
+        os.makedirs(os.path.dirname(os.path.abspath(csv_path)), exist_ok=True)
+        with open(csv_path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file, delimiter=delimiter)
+            width = None
+            empty_rows = 0
+            for row in sheet.iter_rows(values_only=True):
+                cells = [_format_cell(value) for value in row]
+                if width is None:
+                    while cells and cells[-1] == "":
+                        cells.pop()
+                    if cells:
+                        width = len(cells)
+                        writer.writerow(cells)
+                    continue
+                cells = cells[:width] + [""] * (width - len(cells))
+                if not any(cells):
+                    # Only write empty rows if there is more data after them
+                    empty_rows += 1
+                    continue
+                writer.writerows([[""] * width] * empty_rows)
+                empty_rows = 0
+                writer.writerow(cells)
+    finally:
+        workbook.close()
+    return csv_path
+
+
+def _needs_conversion(upload: dict) -> bool:
+    return bool(upload["params"].get("excelSheetName")) and upload["path"].lower().endswith(excel_extensions)
+
+
+def convert_uploads(uploads: list, output_folder: str, max_workers: int = None) -> list:
+    """Pre-convert Excel uploads in parallel.
+
+    'uploads' is a list of {"path": local file, "params": table parameters} dictionaries, as passed to
+    create_data_table, update_data_table or create_decrement_table. Returns a new list in the same order where
+    each Excel upload with an 'excelSheetName' points at the converted CSV file and has CSV parameters
+    (a 'delimiter' of ',' and a '.csv' filePath). Other uploads are returned unchanged."""
+    converted = list(uploads)
+    to_convert = [(i, upload) for i, upload in enumerate(uploads) if _needs_conversion(upload)]
+    if not to_convert:
+        return converted
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for i, upload in to_convert:
+            base_name = os.path.splitext(os.path.basename(upload["path"]))[0]
+            csv_path = os.path.join(output_folder, f"{i} - {base_name} - {upload['params']['excelSheetName']}.csv")
+            futures[i] = executor.submit(convert_sheet, upload["path"], upload["params"]["excelSheetName"], csv_path)
+
+        for i, upload in to_convert:
+            csv_path = futures[i].result()
+            params = dict(upload["params"])
+            del params["excelSheetName"]
+            params["delimiter"] = ","
+            params["filePath"] = os.path.splitext(params["filePath"])[0] + ".csv"
+            converted[i] = dict(upload, path=csv_path, params=params)
+            logging.debug(f"Converted sheet '{upload['params']['excelSheetName']}' of '{upload['path']}': "
+                          f"{os.path.getsize(upload['path'])} bytes -> {os.path.getsize(csv_path)} bytes")
+    return converted
@@ -0,0 +1,584 @@
+import csv
+import datetime
+import io
+import itertools
+import json
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class MockServerConfig:
+    """Behaviour of the local stand-in SLOPE server."""
+    latency_seconds: float = 0.0                # Added to every API and transfer request
+    page_size: int = 200                        # Maximum items returned per page by the list endpoints
+    data_table_page_rows: int = 10000           # Maximum rows returned per page by DataTables/Data
+    rate_limit_per_second: float = None         # Requests per second before 429s are returned. None = no limit
+    rate_limit_burst: int = 20
+    token_lifetime_seconds: int = 600
+    report_delay_seconds: float = 0.0           # Time between starting a report generation and it being available
+    report_rows: int = 1000
+    projection_runtime_seconds: float = 1.0
+    projection_concurrency: int = 4             # Projections that can run at once. Later runs queue behind them
+    list_item_count: int = 500                  # Number of seeded items returned by each model list endpoint
+    table_structure_count: int = 5
+    data_table_rows: int = 50000                # Rows in each seeded data table
+    data_table_columns: int = 8
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256   # The default backlog of 5 resets connections when many loader threads connect at once
+
+
+class MockSlopeServer:
+    """Local HTTP server that implements the endpoints used by SlopeApi.
+
+    Usage:
+        with MockSlopeServer(MockServerConfig(latency_seconds=0.01)) as server:
+            slope_api.SlopeApi.api_url = server.api_url
+            ...
+
+    Presigned upload and download URLs point back at this server. Request counts and bytes
+    transferred are available through 'stats()'."""
+
+    model_id = 1
+
+    def __init__(self, config: MockServerConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockServerConfig()
+        self.report_builder = self.default_report
+        self.__lock = threading.Lock()
+        self.__ids = itertools.count(1000)
+        self.__tokens = {}
+        self.__refresh_tokens = set()
+        self.__files = {}
+        self.__pending_uploads = {}
+        self.__file_ids = {}
+        self.__data_tables = {}
+        self.__decrement_tables = {}
+        self.__scenario_tables = {}
+        self.__projections = {}
+        self.__reports = {}
+        self.__downloads = {}
+        self.__projection_slots = [0.0] * max(self.config.projection_concurrency, 1)
+        self.__allowance = float(self.config.rate_limit_burst)
+        self.__last_check = time.monotonic()
+        self.__stats = {"requests": 0, "connections": 0, "bytes_in": 0, "bytes_out": 0, "rate_limited": 0, "unauthorized": 0, "routes": {}}
+        self.__seed()
+
+        self.__server = _HTTPServer((host, port), self.__handler_class())
+        self.__thread = None
+        self.api_url = f"http://{host}:{self.__server.server_address[1]}/api/v1"
+        self.__routes = [
+            ("POST", r"/api/v1/Authorize", self.__authorize),
+            ("POST", r"/api/v1/Authorize/Refresh", self.__refresh),
+            ("POST", r"/api/v1/Files/GetUploadUrl", self.__get_upload_url),
+            ("POST", r"/api/v1/Files/SaveUpload", self.__save_upload),
+            ("GET", r"/api/v1/Files/GetFiles", self.__get_files),
+            ("POST", r"/api/v1/DataTables", self.__create_data_table),
+            ("PATCH", r"/api/v1/DataTables", self.__update_data_table),
+            ("GET", r"/api/v1/DataTables/Data", self.__get_data_table_data),
+            ("GET", r"/api/v1/Models/(\d+)/DataTables", self.__list_data_tables),
+            ("GET", r"/api/v1/Models/(\d+)/TableStructures", self.__list_table_structures),
+            ("GET", r"/api/v1/Models/(\d+)/DecrementTables", self.__list_decrement_tables),
+            ("GET", r"/api/v1/Models/(\d+)/ScenarioTables", self.__list_scenario_tables),
+            ("GET", r"/api/v1/Models/(\d+)/ImprovementScales", self.__list_improvement_scales),
+            ("GET", r"/api/v1/Models/(\d+)/ProjectionTemplates", self.__list_projection_templates),
+            ("GET", r"/api/v1/TableStructures/(\d+)/DataTables", self.__list_structure_data_tables),
+            ("GET", r"/api/v1/TableStructures/(\d+)/Columns", self.__list_structure_columns),
+            ("POST", r"/api/v1/DecrementTables", self.__create_decrement_table),
+            ("POST", r"/api/v1/ScenarioTables", self.__create_scenario_table),
+            ("POST", r"/api/v1/Projections", self.__create_projection),
+            ("POST", r"/api/v1/Projections/(\d+)/Copy", self.__copy_projection),
+            ("POST", r"/api/v1/Projections/(\d+)/run", self.__run_projection),
+            ("PATCH", r"/api/v1/Projections/(\d+)", self.__update_projection),
+            ("GET", r"/api/v1/Projections/(\d+)", self.__get_projection),
+            ("POST", r"/api/v1/Reports/Workbooks/([^/]+)/Generate", self.__generate_report),
+            ("GET", r"/api/v1/Reports/Workbooks/Status/([^/]+)", self.__report_status),
+            ("PUT", r"/s3/upload/([^/]+)", self.__s3_put),
+            ("GET", r"/s3/download/([^/]+)", self.__s3_get),
+        ]
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="MockSlopeServer", daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def stats(self) -> dict:
+        """Return a copy of the request counters."""
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["routes"] = dict(self.__stats["routes"])
+        return stats
+
+    def reset_stats(self):
+        with self.__lock:
+            self.__stats = {"requests": 0, "connections": 0, "bytes_in": 0, "bytes_out": 0, "rate_limited": 0, "unauthorized": 0, "routes": {}}
+
+    # ---- Seed data ----
+
+    def __seed(self):
+        config = self.config
+        self.table_structures = []
+        for s in range(config.table_structure_count):
+            structure_id = 100 + s
+            columns = [{"name": "ID", "dataType": "String", "isIndex": True}]
+            columns.append({"name": "Age", "dataType": "Integer", "isIndex": True})
+            columns.append({"name": "Active", "dataType": "Boolean", "isIndex": False})
+            for c in range(max(config.data_table_columns - 3, 0)):
+                columns.append({"name": f"Rate {c + 1}", "dataType": "Decimal", "isIndex": False})
+            self.table_structures.append({"id": structure_id, "name": f"Table Structure {s + 1}",
+                                          "description": f"Seeded table structure {s + 1}", "columns": columns})
+
+        for i in range(config.list_item_count):
+            structure = self.table_structures[i % len(self.table_structures)]
+            table_id = next(self.__ids)
+            self.__data_tables[table_id] = {"id": table_id, "name": f"Data Table {i + 1}", "tableStructureId": structure["id"],
+                                            "tableStructureName": structure["name"], "version": 1,
+                                            "columns": structure["columns"], "rows": None}
+            decrement_id = next(self.__ids)
+            self.__decrement_tables[decrement_id] = {"id": decrement_id, "name": f"Decrement Table {i + 1}", "decrementTableType": "Standard"}
+            scenario_id = next(self.__ids)
+            self.__scenario_tables[scenario_id] = {"id": scenario_id, "name": f"Scenario Table {i + 1}"}
+        self.improvement_scales = [{"id": 9000 + i, "name": f"Improvement Scale {i + 1}"} for i in range(config.list_item_count)]
+        self.projection_templates = [{"id": 8000 + i, "name": f"Projection Template {i + 1}"} for i in range(config.list_item_count)]
+
+    def __seeded_rows(self, table: dict) -> list:
+        """Build the contents of a seeded table the first time it is read."""
+        if table["rows"] is None:
+            rate_columns = len(table["columns"]) - 3
+            table["rows"] = [[f"Plan {r % 25}", r % 121, r % 2 == 0] + [round((r * (c + 7) % 1000) / 1000, 6) for c in range(rate_columns)]
+                             for r in range(self.config.data_table_rows)]
+        return table["rows"]
+
+    def add_table_structure(self, name: str, columns: list) -> int:
+        """Add a table structure with the given columns ({"name", "dataType", "isIndex"} dictionaries)."""
+        with self.__lock:
+            structure_id = next(self.__ids)
+            self.table_structures.append({"id": structure_id, "name": name, "description": name, "columns": columns})
+        return structure_id
+
+    def add_data_table(self, name: str, table_structure_id: int, rows: list) -> int:
+        """Add a data table with the given rows to a table structure."""
+        structure = self.__structure(table_structure_id)
+        with self.__lock:
+            table_id = next(self.__ids)
+            self.__data_tables[table_id] = {"id": table_id, "name": name, "tableStructureId": table_structure_id,
+                                            "tableStructureName": structure["name"], "version": 1,
+                                            "columns": structure["columns"], "rows": rows}
+        return table_id
+
+    def data_table(self, data_table_id: int) -> dict:
+        """Return the stored record for a data table (used by simulations to inspect uploaded values)."""
+        with self.__lock:
+            return self.__data_tables[data_table_id]
+
+    # ---- HTTP plumbing ----
+
+    def __handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True   # Headers and body are written separately, so Nagle would delay each response
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                server._count_connection()
+
+            def do_GET(self):
+                server._dispatch(self, "GET")
+
+            def do_POST(self):
+                server._dispatch(self, "POST")
+
+            def do_PUT(self):
+                server._dispatch(self, "PUT")
+
+            def do_PATCH(self):
+                server._dispatch(self, "PATCH")
+
+        return Handler
+
+    def _count_connection(self):
+        with self.__lock:
+            self.__stats["connections"] += 1
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, method: str):
+        url = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+
+        if self.config.latency_seconds:
+            time.sleep(self.config.latency_seconds)
+
+        for route_method, pattern, func in self.__routes:
+            match = re.fullmatch(pattern, url.path)
+            if route_method != method or match is None:
+                continue
+            with self.__lock:
+                self.__stats["requests"] += 1
+                self.__stats["bytes_in"] += len(body)
+                key = f"{method} {pattern}"
+                self.__stats["routes"][key] = self.__stats["routes"].get(key, 0) + 1
+            if not self.__take_rate_limit_token():
+                return self.__send(handler, 429, {"message": "Too Many Requests"}, {"Retry-After": "1"})
+            if url.path.startswith("/api/v1") and "Authorize" not in url.path and not self.__is_authorized(handler):
+                with self.__lock:
+                    self.__stats["unauthorized"] += 1
+                return self.__send(handler, 401, {"message": "Unauthorized"})
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                payload = json.loads(body) if body and handler.headers.get("Content-Type", "").startswith("application/json") else body
+                status, result = func(query, payload, *match.groups())
+            except KeyError as e:
+                status, result = 404, {"message": f"Not found: {e}"}
+            return self.__send(handler, status, result)
+
+        self.__send(handler, 404, {"message": f"No route for {method} {url.path}"})
+
+    def __send(self, handler, status: int, result, headers: dict = None):
+        if isinstance(result, (bytes, bytearray)):
+            content = bytes(result)
+            content_type = "application/octet-stream"
+        else:
+            content = json.dumps(result).encode() if result is not None else b""
+            content_type = "application/json; charset=utf-8"
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(content)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(content)
+        with self.__lock:
+            self.__stats["bytes_out"] += len(content)
+
+    def __take_rate_limit_token(self) -> bool:
+        """Token bucket rate limiter."""
+        rate = self.config.rate_limit_per_second
+        if not rate:
+            return True
+        with self.__lock:
+            now = time.monotonic()
+            self.__allowance = min(self.config.rate_limit_burst, self.__allowance + (now - self.__last_check) * rate)
+            self.__last_check = now
+            if self.__allowance < 1:
+                self.__stats["rate_limited"] += 1
+                return False
+            self.__allowance -= 1
+            return True
+
+    def __is_authorized(self, handler) -> bool:
+        header = handler.headers.get("Authorization", "")
+        token = header[len("Bearer "):] if header.startswith("Bearer ") else None
+        with self.__lock:
+            expires = self.__tokens.get(token)
+        return expires is not None and expires > datetime.datetime.now(datetime.timezone.utc)
+
+    def __paginate(self, items: list, query: dict) -> tuple:
+        limit = min(int(query.get("Limit", self.config.page_size)), self.config.page_size)
+        offset = int(query.get("Offset", 0))
+        next_offset = offset + limit if offset + limit < len(items) else None
+        return 200, {"items": items[offset:offset + limit], "offset": next_offset}
+
+    def __next_id(self) -> int:
+        with self.__lock:
+            return next(self.__ids)
+
+    # ---- Authorization ----
+
+    def __new_token(self) -> dict:
+        access_token = uuid.uuid4().hex
+        refresh_token = uuid.uuid4().hex
+        expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.config.token_lifetime_seconds)
+        with self.__lock:
+            self.__tokens[access_token] = expires
+            self.__refresh_tokens.add(refresh_token)
+        return {"accessToken": access_token, "refreshToken": refresh_token, "expires": expires.isoformat()}
+
+    def __authorize(self, query, payload):
+        return 200, self.__new_token()
+
+    def __refresh(self, query, payload):
+        with self.__lock:
+            known = payload["refreshToken"] in self.__refresh_tokens
+            self.__refresh_tokens.discard(payload["refreshToken"])
+        if not known:
+            return 401, {"message": "Invalid refresh token"}
+        return 200, self.__new_token()
+
+    # ---- Files ----
+
+    def __get_upload_url(self, query, payload):
+        key = uuid.uuid4().hex
+        with self.__lock:
+            self.__pending_uploads[key] = payload["filePath"]
+        return 200, {"uploadUrl": f"{self.api_url[:-len('/api/v1')]}/s3/upload/{key}"}
+
+    def __s3_put(self, query, payload, key):
+        with self.__lock:
+            path = self.__pending_uploads.pop(key)
+            self.__files[path] = payload
+        return 200, None
+
+    def __s3_get(self, query, payload, key):
+        with self.__lock:
+            return 200, self.__downloads[key]
+
+    def __save_upload(self, query, payload):
+        path = payload["filePath"]
+        with self.__lock:
+            if path not in self.__files:
+                return 400, {"message": f"File '{path}' has not been uploaded"}
+            file_id = self.__file_ids.setdefault(path, next(self.__ids))
+        return 200, {"fileId": file_id}
+
+    def __get_files(self, query, payload):
+        with self.__lock:
+            files = [{"fileId": file_id, "filePath": path} for path, file_id in self.__file_ids.items()]
+        return self.__paginate(files, query)
+
+    # ---- Data Tables ----
+
+    def __read_uploaded_table(self, payload: dict) -> tuple:
+        """Parse an uploaded delimited file into columns and rows. Excel files are stored without contents."""
+        with self.__lock:
+            content = self.__files.get(payload["filePath"])
+        if content is None:
+            raise KeyError(payload["filePath"])
+        if payload.get("excelSheetName") or not payload.get("delimiter"):
+            return [], []
+        reader = csv.reader(io.StringIO(content.decode("utf-8-sig")), delimiter=payload["delimiter"])
+        header = next(reader, [])
+        rows = [[self.__parse_value(value) for value in row] for row in reader]
+        columns = []
+        for c, name in enumerate(header):
+            values = [row[c] for row in rows if c < len(row) and row[c] is not None]
+            data_type = "Decimal" if values and all(isinstance(v, (int, float)) for v in values) else "String"
+            columns.append({"name": name, "dataType": data_type, "isIndex": c == 0})
+        return columns, rows
+
+    @staticmethod
+    def __parse_value(value: str):
+        if value == "":
+            return None
+        try:
+            return float(value) if any(ch in value for ch in ".eE") else int(value)
+        except ValueError:
+            return value
+
+    def __structure(self, structure_id: int) -> dict:
+        structure = next((s for s in self.table_structures if s["id"] == structure_id), None)
+        if structure is None:
+            raise KeyError(structure_id)   # Answered with a 404 by _dispatch
+        return structure
+
+    def __create_data_table(self, query, payload):
+        columns, rows = self.__read_uploaded_table(payload)
+        structure_id = payload["tableStructureId"]
+        with self.__lock:
+            if any(t["name"] == payload["name"] and t["tableStructureId"] == structure_id for t in self.__data_tables.values()):
+                return 409, {"message": "A data table with this name already exists"}
+            table_id = next(self.__ids)
+            structure_name = next((s["name"] for s in self.table_structures if s["id"] == structure_id), "")
+            self.__data_tables[table_id] = {"id": table_id, "name": payload["name"], "tableStructureId": structure_id,
+                                            "tableStructureName": structure_name, "version": 1, "columns": columns, "rows": rows}
+        return 200, {"id": table_id}
+
+    def __update_data_table(self, query, payload):
+        columns, rows = self.__read_uploaded_table(payload)
+        structure_id = payload["tableStructureId"]
+        with self.__lock:
+            versions = [t for t in self.__data_tables.values() if t["name"] == payload["name"] and t["tableStructureId"] == structure_id]
+            if not versions:
+                return 404, {"message": "Data table not found"}
+            latest = max(versions, key=lambda t: t["version"])
+            table_id = next(self.__ids)
+            self.__data_tables[table_id] = dict(latest, id=table_id, version=latest["version"] + 1, columns=columns, rows=rows)
+        return 200, {"id": table_id}
+
+    def __get_data_table_data(self, query, payload):
+        with self.__lock:
+            if "DataTableId" in query:
+                table = self.__data_tables[int(query["DataTableId"])]
+            else:
+                structure_id = int(query["TableStructureId"])
+                versions = [t for t in self.__data_tables.values() if t["name"] == query["Name"] and t["tableStructureId"] == structure_id]
+                if "Version" in query:
+                    versions = [t for t in versions if t["version"] == int(query["Version"])]
+                if not versions:
+                    return 404, {"message": "Data table not found"}
+                table = max(versions, key=lambda t: t["version"])
+            rows = self.__seeded_rows(table)
+        offset = int(query.get("Offset", 0))
+        end = offset + self.config.data_table_page_rows
+        return 200, {"id": table["id"], "name": table["name"], "columns": [dict(c) for c in table["columns"]],
+                     "rows": rows[offset:end], "offset": end if end < len(rows) else None}
+
+    @staticmethod
+    def __data_table_summary(table: dict) -> dict:
+        return {key: table[key] for key in ("id", "name", "tableStructureId", "tableStructureName", "version")}
+
+    def __list_data_tables(self, query, payload, model_id):
+        with self.__lock:
+            tables = [self.__data_table_summary(t) for t in self.__data_tables.values()]
+        if "TableStructureName" in query:
+            tables = [t for t in tables if t["tableStructureName"] == query["TableStructureName"]]
+        return self.__paginate(tables, query)
+
+    def __list_structure_data_tables(self, query, payload, structure_id):
+        with self.__lock:
+            tables = [self.__data_table_summary(t) for t in self.__data_tables.values() if t["tableStructureId"] == int(structure_id)]
+        return self.__paginate(tables, query)
+
+    def __list_table_structures(self, query, payload, model_id):
+        structures = [{"id": s["id"], "name": s["name"], "description": s["description"]} for s in self.table_structures]
+        return self.__paginate(structures, query)
+
+    def __list_structure_columns(self, query, payload, structure_id):
+        return self.__paginate(self.__structure(int(structure_id))["columns"], query)
+
+    # ---- Other tables ----
+
+    def __create_decrement_table(self, query, payload):
+        with self.__lock:
+            if payload["filePath"] not in self.__files:
+                return 400, {"message": f"File '{payload['filePath']}' has not been uploaded"}
+            table_id = next(self.__ids)
+            self.__decrement_tables[table_id] = {"id": table_id, "name": payload["name"], "decrementTableType": payload.get("decrementTableType")}
+        return 200, {"id": table_id}
+
+    def __list_decrement_tables(self, query, payload, model_id):
+        with self.__lock:
+            tables = list(self.__decrement_tables.values())
+        return self.__paginate(tables, query)
+
+    def __create_scenario_table(self, query, payload):
+        with self.__lock:
+            if payload["filePath"] not in self.__files:
+                return 400, {"message": f"File '{payload['filePath']}' has not been uploaded"}
+            table_id = next(self.__ids)
+            self.__scenario_tables[table_id] = {"id": table_id, "name": payload["name"]}
+        return 200, {"id": table_id}
+
+    def __list_scenario_tables(self, query, payload, model_id):
+        with self.__lock:
+            tables = list(self.__scenario_tables.values())
+        return self.__paginate(tables, query)
+
+    def __list_improvement_scales(self, query, payload, model_id):
+        return self.__paginate(self.improvement_scales, query)
+
+    def __list_projection_templates(self, query, payload, model_id):
+        return self.__paginate(self.projection_templates, query)
+
+    # ---- Projections ----
+
+    def add_projection(self, name: str, data_tables: list = None, status: str = "NotStarted") -> int:
+        """Add a projection directly to the server state, e.g. an already completed run to start a solver from."""
+        with self.__lock:
+            projection_id = next(self.__ids)
+            self.__projections[projection_id] = {"id": projection_id, "name": name, "status": status, "finishesAt": None,
+                                                 "dataTables": [dict(t) for t in data_tables or []], "portfolios": []}
+        return projection_id
+
+    def __projection_details(self, projection: dict) -> dict:
+        if projection["finishesAt"] is not None and time.monotonic() >= projection["finishesAt"]:
+            projection["status"] = "Completed"
+            projection["finishesAt"] = None
+        details = {key: value for key, value in projection.items() if key != "finishesAt"}
+        details["isRunning"] = projection["status"] == "Running"
+        return details
+
+    def projection(self, projection_id: int) -> dict:
+        """Return the current details of a projection."""
+        with self.__lock:
+            return self.__projection_details(self.__projections[projection_id])
+
+    def __create_projection(self, query, payload):
+        return 200, {"id": self.add_projection(payload["name"])}
+
+    def __copy_projection(self, query, payload, projection_id):
+        with self.__lock:
+            source = self.__projections[int(projection_id)]
+            new_id = next(self.__ids)
+            self.__projections[new_id] = {"id": new_id, "name": payload["projectionName"], "status": "NotStarted", "finishesAt": None,
+                                          "dataTables": [dict(t) for t in source["dataTables"]], "portfolios": list(source["portfolios"])}
+        return 200, {"id": new_id}
+
+    def __update_projection(self, query, payload, projection_id):
+        with self.__lock:
+            projection = self.__projections[int(projection_id)]
+            for update in payload.get("dataTables", []):
+                existing = next((t for t in projection["dataTables"] if t["tableStructureName"] == update["tableStructureName"]), None)
+                if existing is None:
+                    projection["dataTables"].append(dict(update))
+                else:
+                    existing.update(update)
+            for key, value in payload.items():
+                if key != "dataTables":
+                    projection[key] = value
+        return 200, None
+
+    def __run_projection(self, query, payload, projection_id):
+        with self.__lock:
+            projection = self.__projections[int(projection_id)]
+            self.__projection_details(projection)
+            if projection["status"] == "Running":
+                return 409, {"message": "Projection is already running"}
+            # Start in the first free slot, queueing behind earlier runs when all of the slots are busy
+            slot = min(range(len(self.__projection_slots)), key=lambda i: self.__projection_slots[i])
+            start = max(time.monotonic(), self.__projection_slots[slot])
+            self.__projection_slots[slot] = start + self.config.projection_runtime_seconds
+            projection["status"] = "Running"
+            projection["finishesAt"] = self.__projection_slots[slot]
+        return 200, None
+
+    def __get_projection(self, query, payload, projection_id):
+        details = self.projection(int(projection_id))
+        if "Fields" in query:
+            details = {field: details.get(field) for field in query["Fields"].split(",")}
+        return 200, details
+
+    # ---- Reports ----
+
+    def default_report(self, workbook_id: str, element_id: str, format_type: str, parameters: dict) -> bytes:
+        """Build a CSV report with 'report_rows' rows."""
+        lines = ["Projection ID,Period,Value"]
+        projection_id = (parameters or {}).get("Projection-ID", "")
+        lines.extend(f"{projection_id},{i},{i * 1.5}" for i in range(self.config.report_rows))
+        return ("\n".join(lines) + "\n").encode()
+
+    def __generate_report(self, query, payload, workbook_id):
+        generation_id = uuid.uuid4().hex
+        content = self.report_builder(workbook_id, payload["elementId"], payload["reportFormat"], payload.get("parameters"))
+        with self.__lock:
+            self.__reports[generation_id] = {"readyAt": time.monotonic() + self.config.report_delay_seconds, "content": content}
+        return 200, {"generationId": generation_id}
+
+    def __report_status(self, query, payload, generation_id):
+        with self.__lock:
+            report = self.__reports[generation_id]
+            if time.monotonic() < report["readyAt"]:
+                return 200, {"status": "Running"}
+            self.__downloads[generation_id] = report["content"]
+        return 200, {"status": "Completed", "downloadUrl": f"{self.api_url[:-len('/api/v1')]}/s3/download/{generation_id}"}
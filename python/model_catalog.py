@@ -0,0 +1,179 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import slope_api
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogRecord:
+    """One table, structure, scale or template on a model."""
+    kind: str
+    id: int
+    name: str
+    table_structure_id: int = None
+    table_structure_name: str = None
+    version: int = None
+
+
+class _Index:
+    """Lookups for the records of one kind."""
+    __slots__ = ("records", "by_id", "by_name", "by_key")
+
+    def __init__(self, records: list):
+        self.records = records
+        self.by_id = {}
+        self.by_name = {}
+        self.by_key = {}
+        for record in records:
+            self.__add(record)
+
+    @staticmethod
+    def __structures(record: CatalogRecord) -> list:
+        return [structure for structure in (record.table_structure_id, record.table_structure_name) if structure is not None]
+
+    def __add(self, record: CatalogRecord):
+        self.by_id[record.id] = record
+        self.by_name.setdefault(record.name, []).append(record)
+        # Tables can be looked up by table structure ID or name. The latest version is also stored under a version of None
+        for structure in self.__structures(record):
+            self.by_key[(structure, record.name, record.version)] = record
+            latest = self.by_key.get((structure, record.name, None))
+            if latest is None or (record.version or 0) > (latest.version or 0):
+                self.by_key[(structure, record.name, None)] = record
+
+    def __remove(self, record: CatalogRecord):
+        del self.by_id[record.id]
+        same_name = self.by_name[record.name]
+        same_name.remove(record)
+        if not same_name:
+            del self.by_name[record.name]
+        for structure in self.__structures(record):
+            if self.by_key.get((structure, record.name, record.version)) == record:
+                del self.by_key[(structure, record.name, record.version)]
+            if self.by_key.get((structure, record.name, None)) == record:
+                # The latest version was removed, so the next latest of the same structure and name takes its place
+                versions = [other for other in same_name if structure in self.__structures(other)]
+                if versions:
+                    self.by_key[(structure, record.name, None)] = max(versions, key=lambda other: other.version or 0)
+                else:
+                    del self.by_key[(structure, record.name, None)]
+
+    def update(self, records: list) -> tuple:
+        """Change the index to match a new list of records, re-indexing only the records that were added, changed or
+        removed. Returns the number of (added, changed, removed) records."""
+        new_by_id = {record.id: record for record in records}
+        removed = [record for record_id, record in self.by_id.items() if record_id not in new_by_id]
+        changed = [(self.by_id[record.id], record) for record in records if record.id in self.by_id and self.by_id[record.id] != record]
+        added = [record for record in records if record.id not in self.by_id]
+        for record in removed:
+            self.__remove(record)
+        for old, new in changed:
+            self.__remove(old)
+            self.__add(new)
+        for record in added:
+            self.__add(record)
+        self.records = records
+        return len(added), len(changed), len(removed)
+
+
+class ModelCatalog:
+    """Indexed copy of the tables, structures, scales and templates on a model.
+
+    The lists are fetched concurrently and kept in compact records indexed by ID, by name and (for data tables)
+    by (table structure, name, version), so name to ID lookups do not need to scan freshly paginated lists.
+    Data table names are only unique within a table structure, so look data tables up with data_table() rather than find().
+
+    Usage:
+        catalog = ModelCatalog(api, model_id)
+        structure_id = catalog.find("table_structures", "Pricing Input").id
+        table = catalog.data_table("Pricing Input", "Solver Table")   # Latest version
+        catalog.refresh(["data_tables"])                              # Only re-fetch what changed
+    """
+
+    kinds = {
+        "table_structures": slope_api.SlopeApi.list_table_structures,
+        "data_tables": slope_api.SlopeApi.list_data_tables,
+        "decrement_tables": slope_api.SlopeApi.list_decrement_tables,
+        "scenario_tables": slope_api.SlopeApi.get_scenario_tables,
+        "improvement_scales": slope_api.SlopeApi.get_improvement_scales,
+        "projection_templates": slope_api.SlopeApi.get_projection_templates,
+    }
+
+    def __init__(self, api: slope_api.SlopeApi, model_id: int, kinds: list = None, max_workers: int = 6):
+        self.api = api
+        self.model_id = model_id
+        self.max_workers = max_workers
+        self.__indexes = {}
+        self.__lock = threading.Lock()
+        self.refresh(kinds)
+
+    @staticmethod
+    def __to_record(kind: str, item: dict) -> CatalogRecord:
+        return CatalogRecord(kind, item["id"], item["name"], item.get("tableStructureId"), item.get("tableStructureName"), item.get("version"))
+
+    def __fetch(self, kind: str) -> list:
+        items = self.kinds[kind](self.api, self.model_id)
+        logging.debug(f"Loaded {len(items)} {kind} for model {self.model_id}")
+        return [self.__to_record(kind, item) for item in items]
+
+    def refresh(self, kinds: list = None):
+        """Re-fetch the given kinds (all kinds by default) in parallel.
+        The API only returns whole lists, so each kind is fetched in full, but only the records that were added, changed
+        or removed since the last fetch are re-indexed."""
+        kinds = list(kinds or self.kinds)
+        unknown = [kind for kind in kinds if kind not in self.kinds]
+        if unknown:
+            raise ValueError(f"Unknown catalog kinds: {unknown}")
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(kinds))) as executor:
+            fetched = dict(zip(kinds, executor.map(self.__fetch, kinds)))
+        with self.__lock:
+            for kind, records in fetched.items():
+                index = self.__indexes.get(kind)
+                if index is None:
+                    self.__indexes[kind] = _Index(records)
+                    continue
+                added, changed, removed = index.update(records)
+                logging.debug(f"Refreshed {kind} for model {self.model_id}: {added} added, {changed} changed, {removed} removed")
+
+    def __index(self, kind: str) -> _Index:
+        # Callers hold the lock, because refresh() updates indexes in place
+        index = self.__indexes.get(kind)
+        if index is None:
+            raise KeyError(f"'{kind}' have not been loaded into the catalog for model {self.model_id}")
+        return index
+
+    def records(self, kind: str) -> list:
+        """Return all records of a kind."""
+        with self.__lock:
+            return list(self.__index(kind).records)
+
+    def get(self, kind: str, record_id: int) -> CatalogRecord:
+        """Return the record of a kind with the given ID."""
+        with self.__lock:
+            record = self.__index(kind).by_id.get(record_id)
+        if record is None:
+            raise KeyError(f"No {kind} with ID {record_id} on model {self.model_id}")
+        return record
+
+    def find(self, kind: str, name: str) -> CatalogRecord:
+        """Return the record of a kind with the given name. If there are several versions, the latest is returned.
+        Raises a ValueError if the name belongs to more than one table structure; use data_table() for those."""
+        with self.__lock:
+            records = list(self.__index(kind).by_name.get(name, []))
+        if not records:
+            raise KeyError(f"No {kind} named '{name}' on model {self.model_id}")
+        structures = {record.table_structure_id or record.table_structure_name for record in records}
+        if len(structures) > 1:
+            raise ValueError(f"{len(structures)} table structures have {kind} named '{name}' on model {self.model_id}. "
+                             f"Use data_table() with the table structure instead.")
+        return max(records, key=lambda record: record.version or 0)
+
+    def data_table(self, table_structure, name: str, version: int = None) -> CatalogRecord:
+        """Return a data table by table structure (name or ID), table name and version (latest if not given)."""
+        with self.__lock:
+            record = self.__index("data_tables").by_key.get((table_structure, name, version))
+        if record is None:
+            raise KeyError(f"No data table named '{name}' version '{version or 'latest'}' for table structure {table_structure}")
+        return record
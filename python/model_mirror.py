@@ -0,0 +1,146 @@
+import argparse
+import datetime
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import keys, model_catalog, setup, slope_api
+from table_backends import require_optional
+
+
+class ModelMirror:
+    """Keeps a local copy of the data tables on a model.
+
+    The remote table list is compared with a local manifest and only new or changed tables are downloaded,
+    in parallel, and stored as Parquet files (one per table version):
+
+        <folder>/manifest.json
+        <folder>/data_tables/<table structure ID>/<data table ID>.parquet
+
+    The API does not provide decrement table contents, so decrement tables are only recorded in the manifest."""
+
+    manifest_name = "manifest.json"
+
+    def __init__(self, api: slope_api.SlopeApi, model_id: int, folder: str, max_workers: int = 8, prune: bool = True):
+        self.api = api
+        self.model_id = model_id
+        self.folder = folder
+        self.max_workers = max_workers
+        self.prune = prune    # Remove local tables that no longer exist on the model
+        self.__lock = threading.Lock()
+        self.manifest = self.__load_manifest()
+
+    def __manifest_path(self) -> str:
+        return os.path.join(self.folder, self.manifest_name)
+
+    def __load_manifest(self) -> dict:
+        if not os.path.exists(self.__manifest_path()):
+            return {"model_id": self.model_id, "data_tables": {}, "decrement_tables": {}}
+        with open(self.__manifest_path()) as file:
+            manifest = json.load(file)
+        if manifest["model_id"] != self.model_id:
+            raise ValueError(f"'{self.folder}' is a mirror of model {manifest['model_id']}, not model {self.model_id}")
+        return manifest
+
+    def __save_manifest(self):
+        """Write the manifest to a temporary file first so an interrupted sync never leaves a partial manifest."""
+        with self.__lock:
+            content = json.dumps(self.manifest, indent=2)
+        temp_path = self.__manifest_path() + ".tmp"
+        with open(temp_path, "w") as file:
+            file.write(content)
+        os.replace(temp_path, self.__manifest_path())
+
+    @staticmethod
+    def __entry(record: model_catalog.CatalogRecord) -> dict:
+        return {"name": record.name, "table_structure_id": record.table_structure_id,
+                "table_structure_name": record.table_structure_name, "version": record.version}
+
+    def changed_tables(self, catalog: model_catalog.ModelCatalog) -> list:
+        """Return the remote data tables that are not in the manifest or have a different version."""
+        changed = []
+        for record in catalog.records("data_tables"):
+            local = self.manifest["data_tables"].get(str(record.id))
+            if local is None or local["version"] != record.version or not os.path.exists(os.path.join(self.folder, local["file"])):
+                changed.append(record)
+        return changed
+
+    def __download(self, record: model_catalog.CatalogRecord):
+        pq = require_optional("pyarrow.parquet", "pyarrow", "Mirroring tables to Parquet")
+        relative_path = os.path.join("data_tables", str(record.table_structure_id), f"{record.id}.parquet")
+        path = os.path.join(self.folder, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        table = self.api.get_data_table_by_id(record.id, backend="arrow")
+        with self.api.tracer.span("write_parquet", "mirror", rows=table.num_rows):
+            pq.write_table(table, path + ".tmp", compression="zstd")
+            os.replace(path + ".tmp", path)
+
+        entry = self.__entry(record)
+        entry["file"] = relative_path
+        entry["rows"] = table.num_rows
+        entry["synced"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        with self.__lock:
+            self.manifest["data_tables"][str(record.id)] = entry
+
+    def sync(self) -> dict:
+        """Bring the local copy up to date. Returns counts of downloaded, unchanged, removed and failed tables."""
+        os.makedirs(self.folder, exist_ok=True)
+        with self.api.tracer.span("mirror_sync", "mirror", model_id=self.model_id):
+            catalog = model_catalog.ModelCatalog(self.api, self.model_id, ["data_tables", "decrement_tables"])
+            changed = self.changed_tables(catalog)
+            remote_ids = {str(record.id) for record in catalog.records("data_tables")}
+            logging.info(f"Model {self.model_id}: {len(changed)} of {len(remote_ids)} data tables are new or changed")
+
+            failed = 0
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self.__download, record): record for record in changed}
+                for count, future in enumerate(as_completed(futures), 1):
+                    record = futures[future]
+                    try:
+                        future.result()
+                        logging.info(f"[{count}/{len(changed)}] Downloaded data table '{record.name}' (ID {record.id})")
+                    except Exception as e:
+                        failed += 1
+                        logging.error(f"Failed to download data table '{record.name}' (ID {record.id}): {e}")
+                    # Save progress as we go so an interrupted sync does not download the same tables again
+                    self.__save_manifest()
+
+            removed = 0
+            if self.prune:
+                for table_id in set(self.manifest["data_tables"]) - remote_ids:
+                    entry = self.manifest["data_tables"].pop(table_id)
+                    path = os.path.join(self.folder, entry["file"])
+                    if os.path.exists(path):
+                        os.remove(path)
+                    removed += 1
+
+            self.manifest["decrement_tables"] = {str(record.id): {"name": record.name} for record in catalog.records("decrement_tables")}
+            self.manifest["last_sync"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            self.__save_manifest()
+
+        summary = {"downloaded": len(changed) - failed, "unchanged": len(remote_ids) - len(changed), "removed": removed, "failed": failed}
+        logging.info(f"Model {self.model_id} mirror sync finished: {summary}")
+        return summary
+
+    def read_table(self, data_table_id: int):
+        """Read a mirrored data table back as a pyarrow Table."""
+        pq = require_optional("pyarrow.parquet", "pyarrow", "Mirroring tables to Parquet")
+        entry = self.manifest["data_tables"][str(data_table_id)]
+        return pq.read_table(os.path.join(self.folder, entry["file"]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Incrementally mirror the data tables on a SLOPE model to a local folder.")
+    parser.add_argument("model_id", type=int, help="ID of the model to mirror")
+    parser.add_argument("folder", help="Local folder for the mirror")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum number of tables downloaded at once")
+    parser.add_argument("--keep-removed", action="store_true", help="Keep local copies of tables that were removed from the model")
+    args = parser.parse_args()
+
+    setup.setup_logging(logging.INFO)
+
+    api_client = slope_api.SlopeApi(max_connections=args.workers)
+    api_client.authorize(keys.api_key, keys.api_secret)
+    ModelMirror(api_client, args.model_id, args.folder, args.workers, not args.keep_removed).sync()
@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import excel_convert, slope_api, table_validation
+
+
+class PipelineError(Exception):
+    pass
+
+
+@dataclass
+class Step:
+    """One unit of work in a pipeline. 'func' is called with the results of all completed steps (by step name)."""
+    name: str
+    func: object
+    depends_on: list = field(default_factory=list)
+    retries: int = None     # None = use the pipeline default
+
+
+class Pipeline:
+    """Runs steps as soon as the steps they depend on have finished, with independent steps running in parallel.
+
+    Failed steps are retried with an increasing delay. The result of every completed step is written to a
+    checkpoint file, so running the same pipeline again after a failure skips the steps that already succeeded."""
+
+    def __init__(self, api: slope_api.SlopeApi, steps: list, checkpoint_path: str = None, max_workers: int = 4,
+                 retries: int = 2, retry_delay: float = 5):
+        self.api = api
+        self.steps = {step.name: step for step in steps}
+        self.checkpoint_path = checkpoint_path
+        self.max_workers = max_workers
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.__lock = threading.Lock()
+        self.results = self.__load_checkpoint()
+
+        for step in steps:
+            missing = [name for name in step.depends_on if name not in self.steps]
+            if missing:
+                raise PipelineError(f"Step '{step.name}' depends on unknown steps: {missing}")
+        self.__check_for_cycles()
+
+    def __check_for_cycles(self):
+        visited = set()
+        in_progress = set()
+
+        def visit(name):
+            if name in in_progress:
+                raise PipelineError(f"Steps have a circular dependency involving '{name}'")
+            if name in visited:
+                return
+            in_progress.add(name)
+            for dependency in self.steps[name].depends_on:
+                visit(dependency)
+            in_progress.remove(name)
+            visited.add(name)
+
+        for name in self.steps:
+            visit(name)
+
+    def __load_checkpoint(self) -> dict:
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path) as file:
+            results = json.load(file)
+        logging.info(f"Resuming pipeline from checkpoint '{self.checkpoint_path}'. Completed steps: {list(results)}")
+        return results
+
+    def __save_checkpoint(self):
+        if self.checkpoint_path is None:
+            return
+        with self.__lock:
+            content = json.dumps(self.results, indent=2)
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w") as file:
+            file.write(content)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def __run_step(self, step: Step):
+        retries = self.retries if step.retries is None else step.retries
+        for attempt in range(retries + 1):
+            try:
+                with self.api.tracer.span(step.name, "pipeline", attempt=attempt + 1):
+                    with self.__lock:
+                        results = dict(self.results)
+                    return step.func(results)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = self.retry_delay * 2 ** attempt
+                logging.warning(f"Step '{step.name}' failed ({e}). Retrying in {delay} seconds.")
+                time.sleep(delay)
+
+    def run(self) -> dict:
+        """Run all steps that have not completed yet. Returns the results of all steps by step name."""
+        pending = {name: step for name, step in self.steps.items() if name not in self.results}
+        running = {}
+        failures = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # Start everything whose dependencies are done, unless a step has failed
+                if not failures:
+                    for name, step in list(pending.items()):
+                        if all(dependency in self.results for dependency in step.depends_on):
+                            logging.info(f"Starting step '{name}'")
+                            running[executor.submit(self.__run_step, step)] = name
+                            del pending[name]
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logging.error(f"Step '{name}' failed: {e}")
+                        failures[name] = e
+                        continue
+                    logging.info(f"Finished step '{name}'")
+                    with self.__lock:
+                        self.results[name] = result
+                    self.__save_checkpoint()
+
+        if failures:
+            raise PipelineError(f"Pipeline stopped. Failed steps: {list(failures)}. Not started: {list(pending)}") from next(iter(failures.values()))
+        return self.results
+
+
+def build_steps(api: slope_api.SlopeApi, spec: dict) -> list:
+    """Turn a declarative valuation spec into pipeline steps.
+
+    spec = {
+        "scenario_tables": {key: {"path": local file, "params": create_scenario_table parameters}},
+        "data_tables": {key: {"path": local file, "params": data table parameters, "mode": "create" | "update" | "create_or_update"}},
+        "decrement_tables": {key: {"path": local file, "params": create_decrement_table parameters}},
+        "model_point_files": {key: {"path": local file, "slope_path": path in the SLOPE File Manager}},
+        "projection": {
+            "template_id": projection template ID,
+            "name": projection name,
+            "properties": other projection properties to set (e.g. {"startDate": ...}),
+            "scenario_table": key of the scenario table to use,
+            "data_tables": {table structure name: key of the data table to use},
+            "model_point_files": [{"portfolio": portfolio name, "product": product name, "file": key of the model point file}],
+        },
+        "reports": {key: {"workbook": workbook ID, "element": element ID, "filename": local file, "format": "Csv" | "Excel"}},
+    }
+
+    Uploads and projection creation do not depend on each other and run in parallel. The projection is updated in
+    a single call once everything it refers to exists, then run, and the reports are downloaded in parallel.
+
+    Only steps that can safely be repeated are retried: model point file uploads, data tables in "update" or
+    "create_or_update" mode, the projection update and report downloads. Steps that create something (scenario tables,
+    decrement tables, data tables in "create" mode and the projection) and running the projection are not retried,
+    because a call that failed on the client could still have succeeded in SLOPE, and repeating it would make a duplicate."""
+    steps = []
+    data_table_functions = {"create": api.create_data_table, "update": api.update_data_table, "create_or_update": api.create_or_update_data_table}
+
+    for key, table in spec.get("scenario_tables", {}).items():
+        steps.append(Step(f"scenario_table:{key}", lambda results, t=table: api.create_scenario_table(t["path"], t["params"]), retries=0))
+    for key, table in spec.get("data_tables", {}).items():
+        mode = table.get("mode", "create")
+        func = data_table_functions[mode]
+        steps.append(Step(f"data_table:{key}", lambda results, t=table, f=func: f(t["path"], t["params"]),
+                          retries=0 if mode == "create" else None))
+    for key, table in spec.get("decrement_tables", {}).items():
+        steps.append(Step(f"decrement_table:{key}", lambda results, t=table: api.create_decrement_table(t["path"], t["params"]), retries=0))
+    for key, file in spec.get("model_point_files", {}).items():
+        steps.append(Step(f"model_point_file:{key}", lambda results, f=file: api.upload_file(f["path"], f["slope_path"])))
+
+    projection = spec.get("projection")
+    if projection is None:
+        return steps
+
+    steps.append(Step("create_projection", lambda results: api.create_projection_from_template(projection["template_id"], projection["name"]),
+                      retries=0))
+
+    update_dependencies = ["create_projection"]
+    if "scenario_table" in projection:
+        update_dependencies.append(f"scenario_table:{projection['scenario_table']}")
+    update_dependencies += [f"data_table:{key}" for key in projection.get("data_tables", {}).values()]
+    update_dependencies += [f"model_point_file:{mpf['file']}" for mpf in projection.get("model_point_files", [])]
+
+    def update_projection(results):
+        properties = dict(projection.get("properties", {}))
+        if "scenario_table" in projection:
+            properties["scenarioTableId"] = results[f"scenario_table:{projection['scenario_table']}"]
+        if projection.get("data_tables"):
+            properties["dataTables"] = [{"tableStructureName": structure_name, "dataTableId": results[f"data_table:{key}"]}
+                                        for structure_name, key in projection["data_tables"].items()]
+        if projection.get("model_point_files"):
+            portfolios = {}
+            for mpf in projection["model_point_files"]:
+                products = portfolios.setdefault(mpf["portfolio"], [])
+                products.append({"productName": mpf["product"], "modelPointFile": {"fileId": results[f"model_point_file:{mpf['file']}"]}})
+            properties["portfolios"] = [{"portfolioName": name, "products": products} for name, products in portfolios.items()]
+        api.update_projection(results["create_projection"], properties)
+        return True
+
+    def run_projection(results):
+        # Pipelines sharing the same SlopeApi also share one thread checking all of their projections
+        projection_id = results["create_projection"]
+        status = api.start_projection(projection_id).wait()
+        if status not in ["Completed", "CompletedWithErrors"]:
+            raise PipelineError(f"Projection ID {projection_id} finished with status '{status}'")
+        return status
+
+    # Starting and waiting are one step, so a projection that fails is not in the checkpoint and is run again when
+    # the pipeline is re-run. The step is not retried: a failed status will not change, and a failed start could
+    # still have queued the projection
+    steps.append(Step("update_projection", update_projection, update_dependencies))
+    steps.append(Step("run_projection", run_projection, ["update_projection"], retries=0))
+
+    for key, report in spec.get("reports", {}).items():
+        def download(results, r=report):
+            parameters = dict(r.get("parameters", {}), **{"Projection-ID": f"{results['create_projection']}"})
+            api.download_report(r["workbook"], r["element"], r["filename"], r.get("format", "Csv"), parameters)
+            return r["filename"]
+        steps.append(Step(f"report:{key}", download, ["run_projection"]))
+
+    return steps
+
+
+def convert_excel_uploads(spec: dict, output_folder: str) -> dict:
+    """Return a copy of the spec where Excel data table and decrement table uploads point at CSV copies of their sheet."""
+    spec = dict(spec)
+    keys = [(section, key) for section in ("data_tables", "decrement_tables") for key in spec.get(section, {})]
+    converted = excel_convert.convert_uploads([spec[section][key] for section, key in keys], output_folder)
+    for section in ("data_tables", "decrement_tables"):
+        if section in spec:
+            spec[section] = {key: upload for (s, key), upload in zip(keys, converted) if s == section}
+    return spec
+
+
+def validate_uploads(api: slope_api.SlopeApi, spec: dict):
+    """Check the data table files in the spec against their table structures. Raises a TableValidationError.
+    Tables that already succeeded in a checkpointed run are checked again, which is harmless."""
+    uploads = [table for table in spec.get("data_tables", {}).values() if "tableStructureId" in table["params"]]
+    if uploads:
+        table_validation.TableValidator(api).validate_batch(uploads)
+
+
+def run_pipeline(api: slope_api.SlopeApi, spec: dict, checkpoint_path: str = None, max_workers: int = 4, retries: int = 2,
+                 excel_conversion_folder: str = None, validate: bool = False) -> dict:
+    """Build and run the pipeline for a declarative valuation spec (see build_steps).
+    If 'excel_conversion_folder' is given, Excel uploads are converted to CSV files in that folder first.
+    If 'validate' is True, data table files are checked against their table structures before anything is uploaded."""
+    if excel_conversion_folder is not None:
+        spec = convert_excel_uploads(spec, excel_conversion_folder)
+    if validate:
+        validate_uploads(api, spec)
+    return Pipeline(api, build_steps(api, spec), checkpoint_path, max_workers, retries).run()
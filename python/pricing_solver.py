@@ -1,7 +1,7 @@
 import os
 import pandas as pd
 import logging
-import keys, slope_api
+import keys, model_catalog, slope_api
 
 solver_tolerance = 0.001
 solver_max_iterations = 5
@@ -31,10 +31,9 @@ class Solver:
             os.makedirs(self.solver_folder)
         self.slope_file_path = f"Pricing Solver/{self.projection_id}"
 
-        table_structures = self.api.list_table_structures(self.model_id)
+        self.catalog = model_catalog.ModelCatalog(self.api, self.model_id, ["table_structures"])
         self.pricing_table_name = params["pricing_table_name"]
-        pricing_table_structure = next(table for table in table_structures if table["name"] == params["pricing_table_name"])
-        self.pricing_table_structure_id = pricing_table_structure["id"]
+        self.pricing_table_structure_id = self.catalog.find("table_structures", self.pricing_table_name).id
 
         # Set Display preferences for log messages
         pd.set_option("display.max_columns", None)
@@ -54,7 +53,8 @@ class Solver:
             return None
 
         # Get the Pricing Target from the first completed run
-        initial_guess_table_id = [item for item in projection_details["dataTables"] if item["tableStructureName"] == self.pricing_table_name][0]["dataTableId"]
+        projection_tables = {item["tableStructureName"]: item["dataTableId"] for item in projection_details["dataTables"]}
+        initial_guess_table_id = projection_tables[self.pricing_table_name]
         initial_guess_table = self.api.get_data_table_by_id(initial_guess_table_id)
         prior_guess = initial_guess_table.iloc[0]["Pricing Input"]
         prior_result = self.__get_result(self.projection_id)
@@ -66,7 +66,7 @@ class Solver:
         curr_guess = prior_guess + self.initial_guess_offset
         curr_id = self.__start_run(curr_guess)
         curr_result = self.__get_result(curr_id)
-        diff = abs(curr_result - self.pricing_table_structure_id)
+        diff = abs(curr_result - self.pricing_target)
 
         # Loop until solved or iteration maximum is hit
         iterations = 0
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from table_backends import require_optional
+
+# Non-blocking projection runs. SlopeApi.start_projection returns a ProjectionRun straight away and a single
+# ProjectionPoller thread per SlopeApi checks the status of every run that is being watched, so starting many
+# projections does not need a thread (or a sleep loop) for each of them.
+
+successful_statuses = ("Completed", "CompletedWithErrors")
+
+
+class ProjectionError(Exception):
+    pass
+
+
+class ProjectionRun:
+    """Handle for a projection that has been started.
+
+    Usage:
+        run = api.start_projection(projection_id)
+        run.on_status_change(lambda run, old, new: print(f"{run.projection_id}: {old} -> {new}"))
+        status = run.wait()                                        # Block until finished
+        status = await run                                         # Or wait from an asyncio event loop
+        df = run.result(workbook_id, element_id, "results.csv")    # Wait, download a report and read it
+    """
+
+    def __init__(self, api, projection_id: int):
+        self.api = api
+        self.projection_id = projection_id
+        self.status = None
+        self.history = []       # (time, status) for every status seen
+        self.future = Future()  # Resolves to the final status
+        self.__callbacks = []
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return f"ProjectionRun(projection_id={self.projection_id}, status={self.status!r})"
+
+    def on_status_change(self, callback):
+        """Call callback(run, old_status, new_status) from the poller thread every time the status changes.
+        If a status has already been seen, the callback is first called with (run, None, current status)."""
+        with self.__lock:
+            self.__callbacks.append(callback)
+            status = self.status
+        if status is not None:
+            callback(self, None, status)
+        return callback
+
+    def _update(self, status: str, running: bool):
+        """Called by the poller with the latest status."""
+        with self.__lock:
+            old_status = self.status
+            changed = status != old_status
+            if changed:
+                self.status = status
+                self.history.append((time.time(), status))
+            callbacks = list(self.__callbacks)
+        if changed:
+            self.api.tracer.instant("projection_status", "poll", projection_id=self.projection_id, status=status)
+            logging.info(f"Projection ID {self.projection_id} status: {status}")
+            for callback in callbacks:
+                try:
+                    callback(self, old_status, status)
+                except Exception as e:
+                    logging.error(f"Status callback for Projection ID {self.projection_id} failed: {e}")
+        if not running:
+            self._finish(status)
+
+    def _finish(self, status: str = None, error: Exception = None):
+        """Resolve the future with the final status or an error, unless it is already done (an asyncio waiter that is
+        cancelled cancels the future)."""
+        if self.future.done():
+            return
+        try:
+            if error is None:
+                self.future.set_result(status)
+            else:
+                self.future.set_exception(error)
+        except InvalidStateError:
+            pass    # Cancelled since the check above
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def wait(self, timeout: float = None) -> str:
+        """Wait until the projection has finished and return its final status."""
+        return self.future.result(timeout)
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+    def result(self, workbook_id: str = None, element_id: str = None, filename: str = None, format_type: str = "Csv",
+               parameters: dict = None, timeout: float = None):
+        """Wait until the projection has finished.
+
+        Without a report, return the final status. With a workbook and element, download that report for this projection
+        to 'filename' and return it as a pandas DataFrame (Csv reports) or return the filename (other formats).
+        Raises a ProjectionError if the projection did not complete."""
+        status = self.wait(timeout)
+        if workbook_id is None:
+            return status
+        if status not in successful_statuses:
+            raise ProjectionError(f"Projection ID {self.projection_id} finished with status '{status}'")
+
+        parameters = dict(parameters or {}, **{"Projection-ID": f"{self.projection_id}"})
+        self.api.download_report(workbook_id, element_id, filename, format_type, parameters)
+        if format_type != "Csv":
+            return filename
+        pd = require_optional("pandas", "pandas", "Reading report results")
+        return pd.read_csv(filename)
+
+    async def result_async(self, *args, **kwargs):
+        """result() for asyncio: waits without blocking the event loop and downloads the report in a worker thread."""
+        await self
+        return await asyncio.to_thread(self.result, *args, **kwargs)
+
+
+class ProjectionPoller:
+    """One background thread that checks the status of every watched projection, every 'projection_poll_seconds'.
+    The thread stops when there is nothing left to watch and starts again when another run is watched."""
+
+    def __init__(self, api, max_errors: int = 5):
+        self.api = api
+        self.max_errors = max_errors    # Consecutive failed status checks before a run is failed
+        self.__runs = {}
+        self.__errors = {}
+        self.__thread = None
+        self.__wake = threading.Event()
+        self.__lock = threading.Lock()
+
+    def watch(self, run: ProjectionRun) -> ProjectionRun:
+        """Start polling a run. If the projection is already being watched, its existing run is returned instead."""
+        with self.__lock:
+            if run.projection_id in self.__runs:
+                return self.__runs[run.projection_id]
+            self.__runs[run.projection_id] = run
+            self.__errors[run.projection_id] = 0
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__poll_loop, name="ProjectionPoller", daemon=True)
+                self.__thread.start()
+        # Check the new run straight away instead of waiting for the next poll
+        self.__wake.set()
+        return run
+
+    def __poll(self, run: ProjectionRun):
+        try:
+            details = self.api.get_projection_details(run.projection_id, ["isRunning", "status"])
+        except Exception as e:
+            self.__errors[run.projection_id] += 1
+            if self.__errors[run.projection_id] < self.max_errors:
+                logging.warning(f"Could not check status of Projection ID {run.projection_id} ({e}). Retrying.")
+                return
+            run._finish(error=ProjectionError(f"Could not check status of Projection ID {run.projection_id}: {e}"))
+            return
+        self.__errors[run.projection_id] = 0
+        try:
+            run._update(details["status"], details["isRunning"])
+        except Exception as e:
+            # An unexpected response fails this run only, not the other runs being polled
+            run._finish(error=ProjectionError(f"Could not read status of Projection ID {run.projection_id}: {e!r}"))
+
+    def __poll_loop(self):
+        try:
+            while True:
+                self.__wake.clear()
+                with self.__lock:
+                    runs = list(self.__runs.values())
+                with self.api.tracer.span("poll_projections", "poll", projections=len(runs)):
+                    for run in runs:
+                        self.__poll(run)
+                with self.__lock:
+                    for run in runs:
+                        if run.done():
+                            del self.__runs[run.projection_id]
+                            del self.__errors[run.projection_id]
+                    if not self.__runs:
+                        self.__thread = None
+                        return
+                self.__wake.wait(self.api.projection_poll_seconds)
+        except Exception as e:
+            # Fail the runs still being watched rather than leave their waiters blocked forever
+            logging.error(f"Projection poller stopped: {e}")
+            with self.__lock:
+                runs = list(self.__runs.values())
+                self.__runs.clear()
+                self.__errors.clear()
+            for run in runs:
+                run._finish(error=ProjectionError(f"Projection poller stopped: {e}"))
+        finally:
+            # Let watch() start a new thread. A new thread may already have been started after a normal exit above
+            with self.__lock:
+                if self.__thread is threading.current_thread():
+                    self.__thread = None
@@ -1,19 +1,33 @@
+import os
 import requests
+from requests.adapters import HTTPAdapter
 import datetime
 import logging
 import time
 import threading
-from dateutil.parser import parse
-import pandas as pd
+import projection_run
+import table_backends
+import tracing
+import transfer
+from tracing import traced
 
 class SlopeApi:
     api_url = "https://api.slopesoftware.com/api/v1"
+    projection_poll_seconds = 15   # How often wait_for_completion checks if a projection is done
+    report_poll_seconds = 5        # How often download_report checks if a report has been generated
     __expires: datetime.datetime
     __refresh_token = ""
     __lock = threading.Lock()
 
-    def __init__(self):
+    def __init__(self, tracer: tracing.Tracer = None, max_connections: int = 10, transfer_client: transfer.TransferClient = None):
+        """max_connections: Connections kept open to the API and to file storage. Set it to the number of threads using this client."""
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.transfer = transfer_client if transfer_client is not None else transfer.TransferClient(pool_size=max_connections)
+        self.tracer = tracer if tracer is not None else tracing.default_tracer
+        self.projection_poller = projection_run.ProjectionPoller(self)
         self.session.headers.update({"Content-type": "application/json"})
 
     @staticmethod
@@ -32,6 +46,7 @@ class SlopeApi:
 
         logging.debug(f"API Response: {response}")
 
+    @traced(category="auth")
     def authorize(self, key: str, secret: str):
         """Authenticate the API using API Key and API Secret."""
         with self.__lock:
@@ -45,8 +60,9 @@ class SlopeApi:
             access_token = response.json()["accessToken"]
             self.session.headers.update({"Authorization": f"Bearer {access_token}"})
             self.__refresh_token = response.json()["refreshToken"]
-            self.__expires = parse(response.json()["expires"])
+            self.__expires = self.__parse_expiry(response.json()["expires"])
 
+    @traced(category="auth")
     def refresh(self):
         """Refresh the API authentication session."""
         logging.debug("Refreshing API auth token")
@@ -58,7 +74,13 @@ class SlopeApi:
         access_token = response.json()["accessToken"]
         self.session.headers.update({"Authorization": f"Bearer {access_token}"})
         self.__refresh_token = response.json()["refreshToken"]
-        self.__expires = parse(response.json()["expires"])
+        self.__expires = self.__parse_expiry(response.json()["expires"])
+
+    @staticmethod
+    def __parse_expiry(expires: str) -> datetime.datetime:
+        """Parse the token expiry time. dateutil is imported here so it is only loaded once we authorize."""
+        from dateutil.parser import parse
+        return parse(expires)
 
     def expires_in_seconds(self) -> float:
         """Return the number of seconds until the current API session key expires."""
@@ -82,7 +104,8 @@ class SlopeApi:
             separator = "&" if "?" in url else "?"
             paginated_url = f"{url}{separator}Limit={limit}&Offset={offset}"
             
-            response = self.session.get(paginated_url)
+            with self.tracer.span("get_page", "api", url=url, offset=offset):
+                response = self.session.get(paginated_url)
             self.check_response(response)
             result = response.json()
 
@@ -101,45 +124,26 @@ class SlopeApi:
                 
         return all_items
 
-    @staticmethod
-    def __parse_data_table_json(json) -> pd.DataFrame:
-        """Internal Method for converting data table contents into pandas DataFrame and setting data properties correctly."""
-        columns = []
-        index = []
-        # Get the column names
-        for col in json['columns']:
-            columns.append(col['name'])
-            if col['isIndex']:
-                index.append(col['name'])
-        df = pd.DataFrame.from_records(data=json['rows'], columns=columns)
-        # Convert each column to the correct data type
-        for col in json['columns']:
-            if col['dataType'] == 'Integer' or col['dataType'] == 'Decimal':
-                df[col['name']] = pd.to_numeric(df[col['name']])
-            elif col['dataType'] == 'Boolean':
-                df[col['name']] = df[col['name']].astype(bool)
-            else:
-                df[col['name']] = df[col['name']].astype(str)
-
-        df.set_index(index)
-        return df
-
+    @traced(category="transfer")
     def upload_file(self, filename: str, slope_path: str) -> int:
         """Upload a file from local machine to the SLOPE file manager."""
         self.__keep_alive()
         slope_file_params = {"filePath": slope_path}
-        response = self.session.post(f"{self.api_url}/Files/GetUploadUrl", json=slope_file_params)
+        with self.tracer.span("get_upload_url", "api"):
+            response = self.session.post(f"{self.api_url}/Files/GetUploadUrl", json=slope_file_params)
         upload_url = response.json()["uploadUrl"]
 
         logging.debug(f"Uploading file '{filename}' to '{slope_path}'.")
-        # Note - Do not use session here - this is a direct call to s3 and does not use the Slope session auth
-        response = requests.put(upload_url, data=open(filename, "rb"))
-        self.check_response(response)
+        # Note - Do not use self.session here - this is a direct call to s3 and does not use the Slope session auth
+        with self.tracer.span("s3_put", "transfer", bytes=os.path.getsize(filename)):
+            self.transfer.upload(upload_url, filename, self.check_response)
 
-        response = self.session.post(f"{self.api_url}/Files/SaveUpload", json=slope_file_params)
+        with self.tracer.span("save_upload", "api"):
+            response = self.session.post(f"{self.api_url}/Files/SaveUpload", json=slope_file_params)
         self.check_response(response)
         return response.json()["fileId"]
 
+    @traced()
     def create_data_table(self, filename: str, slope_table_params) -> int:
         """Take a file from the local machine, upload it to SLOPE and create a data table from it."""
         self.__keep_alive()
@@ -149,6 +153,7 @@ class SlopeApi:
         self.check_response(response)
         return response.json()["id"]
 
+    @traced()
     def update_data_table(self, filename: str, slope_table_params) -> int:
         """Take a file from the local machine, upload it to SLOPE and update an existing data table to create a new version of it."""
         self.__keep_alive()
@@ -158,6 +163,7 @@ class SlopeApi:
         self.check_response(response)
         return response.json()["id"]
 
+    @traced()
     def create_or_update_data_table(self, filename: str, slope_table_params) -> int:
         """Take a file from the local machine, upload it to SLOPE.
         If the requested data table does not already exist, create it from this file.
@@ -177,17 +183,21 @@ class SlopeApi:
         self.check_response(response)
         return response.json()["id"]
 
-    def get_data_table_by_id(self, data_table_id: int) -> pd.DataFrame:
+    @traced()
+    def get_data_table_by_id(self, data_table_id: int, backend: str = "pandas"):
         """Download the contents of a data table with given Data Table ID.
-        Returns a pandas DataFrame object with the contents of the table."""
+        Returns a pandas DataFrame object with the contents of the table, or the type produced by the
+        given backend ("pandas_compact", "numpy", "arrow", "polars" - see table_backends.py)."""
         self.__keep_alive()
         logging.debug(f"Retrieving contents of data table with ID '{data_table_id}'")
         endpoint_url = f"{self.api_url}/DataTables/Data?DataTableId={data_table_id}"
-        return self.__get_data_table(endpoint_url)
+        return self.__get_data_table(endpoint_url, backend)
 
-    def get_data_table_by_name(self, table_name: str, table_structure_id: int, version: int = None) -> pd.DataFrame:
+    @traced()
+    def get_data_table_by_name(self, table_name: str, table_structure_id: int, version: int = None, backend: str = "pandas"):
         """Download the contents of a data table with given Data Table Name, Version, and Table Structure ID.
-        Returns a pandas DataFrame object with the contents of the table."""
+        Returns a pandas DataFrame object with the contents of the table, or the type produced by the
+        given backend ("pandas_compact", "numpy", "arrow", "polars" - see table_backends.py)."""
         self.__keep_alive()
         version_name = version or "latest"
         logging.debug(f"Retrieving contents of data table with Name '{table_name}' Version '{version_name}' of Table Structure ID '{table_structure_id}'")
@@ -195,30 +205,52 @@ class SlopeApi:
         if version is not None:
             endpoint_url += f"&Version={version}"
 
-        return self.__get_data_table(endpoint_url)
+        return self.__get_data_table(endpoint_url, backend)
 
-    def __get_data_table(self, url: str) -> pd.DataFrame:
-        """Internal function for getting Data Table contents - Handles pagination of the data contents."""
-        response = self.session.get(url)
+    def __get_data_table(self, url: str, backend: str):
+        """Internal function for getting Data Table contents - Handles pagination of the data contents.
+        Rows from all pages are collected first and converted by the backend once, unless the backend converts page by page."""
+        table_backend = table_backends.get_backend(backend)
+        with self.tracer.span("get_data_table_page", "api", offset=0):
+            response = self.session.get(url)
         self.check_response(response)
         json = response.json()
         if 'rows' not in json:
             logging.error("Data Table Files not implemented yet. Empty Data Returns")
-            return pd.DataFrame()
+            return table_backend.convert([], [])
+
+        columns = json['columns']
+        # Backends with a builder convert each page as it arrives, so only one page of raw rows is held at a time
+        builder = table_backend.begin(columns) if hasattr(table_backend, "begin") else None
+        rows = []
+        row_count = 0
+
+        def add_page(page_rows: list):
+            nonlocal row_count
+            row_count += len(page_rows)
+            if builder is None:
+                rows.extend(page_rows)
+            else:
+                with self.tracer.span("convert_data_table_page", "parse", backend=backend, rows=len(page_rows)):
+                    builder.add(page_rows)
 
-        table = SlopeApi.__parse_data_table_json(json)
+        add_page(json.pop('rows'))
 
         # Check if we got the whole table or if we hit the row limit
         # If row limit was hit, then offset will be not' 'None' (and contain an integer value)
         # Keep looping until we get the whole table
         while json['offset']:
             logging.debug(f"Retrieving more data from table '{json['name']}' ID '{json['id']}' starting at row {json['offset']}")
-            response = self.session.get(url + f"&Offset={json['offset']}")
+            with self.tracer.span("get_data_table_page", "api", offset=json['offset']):
+                response = self.session.get(url + f"&Offset={json['offset']}")
             self.check_response(response)
             json = response.json()
-            table = pd.concat([table, SlopeApi.__parse_data_table_json(json)])
+            add_page(json.pop('rows'))
 
-        return table
+        with self.tracer.span("convert_data_table", "parse", backend=backend, rows=row_count):
+            if builder is not None:
+                return builder.finish()
+            return table_backend.convert(columns, rows)
 
     def get_scenario_tables(self, model_id: int) -> list:
         """Get model's scenario tables with full pagination support."""
@@ -271,6 +303,7 @@ class SlopeApi:
         url = f"{self.api_url}/Models/{model_id}/DecrementTables"
         return self.__paginate_get_request(url)
 
+    @traced()
     def create_decrement_table(self, filename: str, slope_table_params) -> int:
         """Take a file from the local machine, upload it to SLOPE and create a decrement table from it."""
         self.__keep_alive()
@@ -281,6 +314,7 @@ class SlopeApi:
         self.check_response(response)
         return response.json()["id"]
 
+    @traced()
     def create_only_decrement_table(self, slope_table_params) -> int:
         """Create a decrement table from a file that already exists in the SLOPE File Manager."""
         self.__keep_alive()
@@ -290,6 +324,7 @@ class SlopeApi:
         self.check_response(response)
         return response.json()["id"]
 
+    @traced()
     def create_scenario_table(self, filename: str, slope_scenario_table_params) -> int:
         """Take a file from the local machine, upload it to SLOPE and create a scenario table from it."""
         self.__keep_alive()
@@ -299,6 +334,7 @@ class SlopeApi:
         self.check_response(response)
         return response.json()["id"]
 
+    @traced()
     def create_projection_from_template(self, template_id: int, name: str) -> int:
         """Create a new projection from an existing projection template."""
         self.__keep_alive()
@@ -308,6 +344,7 @@ class SlopeApi:
         self.check_response(response)
         return response.json()["id"]
 
+    @traced()
     def copy_projection(self, projection_id: int, name: str, update_tables: bool = True) -> int:
         """Make a Copy of an existing projection."""
         self.__keep_alive()
@@ -317,6 +354,7 @@ class SlopeApi:
         self.check_response(response)
         return response.json()["id"]
 
+    @traced()
     def update_projection(self, projection_id, properties):
         """Update values and properties on a projection."""
         self.__keep_alive()
@@ -324,6 +362,7 @@ class SlopeApi:
         response = self.session.patch(f"{self.api_url}/Projections/{projection_id}", json=properties)
         self.check_response(response)
 
+    @traced()
     def update_projection_mpf(self, projection_id, portfolio_name, product_name, model_point_file_id):
         """Update the Model Point file on a projection."""
         self.__keep_alive()
@@ -342,6 +381,7 @@ class SlopeApi:
         response = self.session.patch(f"{self.api_url}/Projections/{projection_id}", json=projection_update_parameters)
         self.check_response(response)
 
+    @traced()
     def update_projection_table(self, projection_id, table_name, data_table_id):
         """Update the data table being used on a projection."""
         self.__keep_alive()
@@ -355,6 +395,7 @@ class SlopeApi:
         response = self.session.patch(f"{self.api_url}/Projections/{projection_id}", json=projection_update_parameters)
         self.check_response(response)
 
+    @traced()
     def run_projection(self, projection_id):
         """Run a projection."""
         self.__keep_alive()
@@ -362,6 +403,18 @@ class SlopeApi:
         if not response.ok:
             raise Exception(f"Failed to start projection with id: {projection_id}", response.text)
 
+    @traced()
+    def start_projection(self, projection_id: int) -> projection_run.ProjectionRun:
+        """Run a projection without waiting for it to finish.
+        Returns a ProjectionRun that can be waited on, awaited, or used to download results once it is done."""
+        self.run_projection(projection_id)
+        return self.watch_projection(projection_id)
+
+    def watch_projection(self, projection_id: int) -> projection_run.ProjectionRun:
+        """Return a ProjectionRun for a projection that is already running (or queued).
+        Its status is checked by a polling thread shared with all other watched projections."""
+        return self.projection_poller.watch(projection_run.ProjectionRun(self, projection_id))
+
     def is_projection_running(self, projection_id) -> bool:
         """Check if a projection is still running.
         
@@ -387,13 +440,16 @@ class SlopeApi:
         """Get the run status of a projection."""
         return self.get_projection_details(projection_id, ["status"])["status"]
 
+    @traced(category="poll")
     def wait_for_completion(self, projection_id):
         """Wait until a projection has completed running. Periodically check for updates until it is finished."""
         while self.is_projection_running(projection_id):
             status = self.get_projection_status(projection_id)
+            self.tracer.instant("projection_status", "poll", projection_id=projection_id, status=status)
             logging.info(f"Waiting for Projection ID {projection_id} to finish. Current status: {status}")
-            time.sleep(15)  # Check once every 15 seconds if it is done
+            time.sleep(self.projection_poll_seconds)
 
+    @traced()
     def generate_workbook_report(self, workbook_id: str, element_id: str, format_type: str, parameters: dict, row_limit: int = None, offset: int = None) -> dict:
         """Start a workbook report generation."""
         self.__keep_alive()
@@ -420,6 +476,7 @@ class SlopeApi:
         self.check_response(response)
         return response.json()
     
+    @traced()
     def download_report(self, workbook_id: str, element_id: str, filename: str, format_type: str, parameters: dict, row_limit=None, offset=None, timeout=900):
         """Start a workbook report generation and poll for completion. Once complete, download the file."""
         self.__keep_alive()
@@ -433,21 +490,19 @@ class SlopeApi:
         )
         generation_id = report_response["generationId"]
         start_time = time.time()
-        while True:
-            status_response = self.get_workbook_report_status(generation_id)
-            if status_response["status"] == "Completed":
-                download_url = status_response["downloadUrl"]
-                break
-            elif status_response["status"] == "Failed":
-                raise Exception(f"Report generation failed: {status_response.get('message', 'Unknown error')}")
-            if time.time() - start_time > timeout:
-                raise TimeoutError(f"Report generation did not complete within {timeout} seconds.")
-            time.sleep(5)
+        with self.tracer.span("wait_for_report", "poll", generation_id=generation_id):
+            while True:
+                status_response = self.get_workbook_report_status(generation_id)
+                self.tracer.instant("report_status", "poll", generation_id=generation_id, status=status_response["status"])
+                if status_response["status"] == "Completed":
+                    download_url = status_response["downloadUrl"]
+                    break
+                elif status_response["status"] == "Failed":
+                    raise Exception(f"Report generation failed: {status_response.get('message', 'Unknown error')}")
+                if time.time() - start_time > timeout:
+                    raise TimeoutError(f"Report generation did not complete within {timeout} seconds.")
+                time.sleep(self.report_poll_seconds)
         logging.debug(f"Downloading report from {download_url}")
-        file_response = requests.get(download_url)
-        self.check_response(file_response)
-        
         logging.debug(f"Saving as '{filename}'.")
-        file = open(filename, "wb")
-        file.write(file_response.content)
-        file.close()
+        with self.tracer.span("s3_get", "transfer"):
+            self.transfer.download(download_url, filename, self.check_response)
@@ -0,0 +1,117 @@
+import argparse
+import logging
+import math
+import os
+import tempfile
+import time
+import pricing_solver, setup, slope_api
+from mock_server import MockServerConfig, MockSlopeServer
+
+# Replays pricing_solver.Solver end to end against the local mock server, so solver and polling strategies can be
+# compared without using real projection compute. The server models the projection runtime (including queueing when
+# more projections are started than can run at once) and returns a Profit Margin from a response curve of the guess.
+#
+# All durations are given in simulated seconds and divided by the time scale when the simulation runs,
+# e.g. a 600 second projection with a time scale of 200 runs for 3 seconds. Reported times are scaled back.
+# The real overhead of each local request is scaled back too, so keep the time scale modest when comparing polling.
+
+pricing_table_name = "Pricing Input"
+initial_guess = 0.02
+target = 0.05
+
+# Profit Margin produced by a projection for a given Pricing Input guess
+response_curves = {
+    "linear": lambda guess: 0.01 + 0.5 * guess,
+    "concave": lambda guess: 0.08 - 2.0 * (guess - 0.15) ** 2,
+    "logistic": lambda guess: 0.1 / (1 + math.exp(-40 * (guess - 0.08))),
+}
+
+# Solver class, solver settings, client polling intervals (in simulated seconds) and the number of projections the
+# server runs at once to compare. Settings that are left out keep the pricing_solver and MockServerConfig defaults.
+strategies = {
+    "secant, 15s/5s polling": {"solver": pricing_solver.Solver, "projection_poll_seconds": 15, "report_poll_seconds": 5},
+    "secant, 60s/15s polling": {"solver": pricing_solver.Solver, "projection_poll_seconds": 60, "report_poll_seconds": 15},
+    "secant, 5s/1s polling": {"solver": pricing_solver.Solver, "projection_poll_seconds": 5, "report_poll_seconds": 1},
+    "secant, 1 projection slot": {"solver": pricing_solver.Solver, "projection_poll_seconds": 15, "report_poll_seconds": 5,
+                                  "projection_concurrency": 1},
+    "secant, loose tolerance": {"solver": pricing_solver.Solver, "projection_poll_seconds": 15, "report_poll_seconds": 5,
+                                "solver_tolerance": 0.005, "solver_max_iterations": 3},
+}
+
+
+def pricing_report(server: MockSlopeServer, curve, workbook_id: str, element_id: str, format_type: str, parameters: dict) -> bytes:
+    """Build the Pricing report for a projection by applying the response curve to its Pricing Input table."""
+    if workbook_id != pricing_solver.reports["Pricing"]["workbook"]:
+        return server.default_report(workbook_id, element_id, format_type, parameters)
+    projection = server.projection(int(parameters["Projection-ID"]))
+    table_id = next(t["dataTableId"] for t in projection["dataTables"] if t["tableStructureName"] == pricing_table_name)
+    table = server.data_table(table_id)
+    column = [c["name"] for c in table["columns"]].index("Pricing Input")
+    guess = float(table["rows"][0][column])
+    return f"Profit Margin\n{curve(guess)}\n".encode()
+
+
+def simulate(strategy: dict, curve, time_scale: float, projection_runtime: float, report_delay: float, latency: float) -> dict:
+    """Run one solve against a fresh mock server and return its cost."""
+    config = MockServerConfig(latency_seconds=latency / time_scale,
+                              projection_runtime_seconds=projection_runtime / time_scale,
+                              report_delay_seconds=report_delay / time_scale,
+                              projection_concurrency=strategy.get("projection_concurrency", MockServerConfig.projection_concurrency),
+                              list_item_count=0)
+    saved = (slope_api.SlopeApi.api_url, slope_api.SlopeApi.projection_poll_seconds, slope_api.SlopeApi.report_poll_seconds,
+             pricing_solver.solver_folder, pricing_solver.solver_tolerance, pricing_solver.solver_max_iterations)
+    with tempfile.TemporaryDirectory() as folder, MockSlopeServer(config) as server:
+        columns = [{"name": "ID", "dataType": "String", "isIndex": True}, {"name": "Pricing Input", "dataType": "Decimal", "isIndex": False}]
+        structure_id = server.add_table_structure(pricing_table_name, columns)
+        table_id = server.add_data_table("Initial Pricing Input", structure_id, [[None, initial_guess]])
+        projection_id = server.add_projection("Initial Pricing Run", [{"tableStructureName": pricing_table_name, "dataTableId": table_id}], "Completed")
+        server.report_builder = lambda *args: pricing_report(server, curve, *args)
+
+        try:
+            slope_api.SlopeApi.api_url = server.api_url
+            slope_api.SlopeApi.projection_poll_seconds = strategy["projection_poll_seconds"] / time_scale
+            slope_api.SlopeApi.report_poll_seconds = strategy["report_poll_seconds"] / time_scale
+            pricing_solver.solver_folder = folder + os.sep
+            pricing_solver.solver_tolerance = strategy.get("solver_tolerance", pricing_solver.solver_tolerance)
+            pricing_solver.solver_max_iterations = strategy.get("solver_max_iterations", pricing_solver.solver_max_iterations)
+
+            solver = strategy["solver"]({"model_id": server.model_id, "pricing_table_name": pricing_table_name,
+                                         "projection_id": projection_id, "target": target})
+            server.reset_stats()
+            start = time.perf_counter()
+            guess = solver.solve()
+            elapsed = time.perf_counter() - start
+        finally:
+            (slope_api.SlopeApi.api_url, slope_api.SlopeApi.projection_poll_seconds, slope_api.SlopeApi.report_poll_seconds,
+             pricing_solver.solver_folder, pricing_solver.solver_tolerance, pricing_solver.solver_max_iterations) = saved
+
+        stats = server.stats()
+    return {
+        "guess": guess,
+        "error": abs(curve(guess) - target) if guess is not None else None,
+        "wall_clock_seconds": elapsed * time_scale,
+        "projection_runs": sum(count for route, count in stats["routes"].items() if route.endswith("/run")),
+        "api_calls": stats["requests"],
+        "bytes": stats["bytes_in"] + stats["bytes_out"],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate the pricing solver against a local mock server.")
+    parser.add_argument("--time-scale", type=float, default=200, help="How many times faster than real time to run")
+    parser.add_argument("--projection-runtime", type=float, default=600, help="Simulated projection runtime in seconds")
+    parser.add_argument("--report-delay", type=float, default=20, help="Simulated report generation time in seconds")
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated API latency in seconds")
+    args = parser.parse_args()
+
+    setup.setup_logging(logging.WARNING)
+
+    print(f"{'Strategy':<28} {'Curve':<10} {'Guess':>9} {'Error':>10} {'Wall clock s':>13} {'Runs':>5} {'API calls':>10} {'KiB':>8}")
+    for strategy_name, strategy in strategies.items():
+        for curve_name, curve in response_curves.items():
+            r = simulate(strategy, curve, args.time_scale, args.projection_runtime, args.report_delay, args.latency)
+            # solve() returns None when it cannot start, e.g. the initial projection has not completed
+            guess = f"{r['guess']:>9.5f}" if r["guess"] is not None else f"{'-':>9}"
+            error = f"{r['error']:>10.6f}" if r["error"] is not None else f"{'-':>10}"
+            print(f"{strategy_name:<28} {curve_name:<10} {guess} {error} {r['wall_clock_seconds']:>13.0f} "
+                  f"{r['projection_runs']:>5} {r['api_calls']:>10} {r['bytes'] / 1024:>8.1f}")
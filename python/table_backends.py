@@ -0,0 +1,253 @@
+import importlib
+import logging
+
+# Converters from the data table JSON returned by the SLOPE API into in-memory tables.
+# Each backend imports its library the first time it is used, so scripts that never read table contents
+# do not pay for importing pandas, NumPy, pyarrow or polars.
+#
+# A backend takes the column definitions ({"name", "dataType", "isIndex"}) and the rows of all pages of a table.
+# A backend can also have a 'begin(columns)' method returning a builder with 'add(rows)' and 'finish()' methods,
+# in which case each page is passed to the builder as it is downloaded instead of collecting all rows first.
+
+
+def require_optional(module: str, package: str, feature: str):
+    """Import an optional dependency, raising an ImportError that says how to install it."""
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise ImportError(f"{feature} requires the '{package}' package. Install it with 'pip install {package}'.") from e
+
+
+def _column_values(rows: list, position: int) -> list:
+    return [row[position] for row in rows]
+
+
+class PandasBackend:
+    """pandas DataFrame with numeric, bool and str columns."""
+
+    def convert(self, columns: list, rows: list):
+        pd = require_optional("pandas", "pandas", "The 'pandas' table backend")
+        df = pd.DataFrame.from_records(data=rows, columns=[col['name'] for col in columns])
+        # Convert each column to the correct data type
+        for col in columns:
+            df[col['name']] = self.convert_column(pd, df[col['name']], col['dataType'])
+        return df
+
+    @staticmethod
+    def convert_column(pd, values, data_type: str):
+        if data_type == 'Integer' or data_type == 'Decimal':
+            return pd.to_numeric(values)
+        elif data_type == 'Boolean':
+            return values.astype(bool)
+        else:
+            return values.astype(str)
+
+
+class _CompactTableBuilder:
+    """Builds a CompactPandasBackend table one page at a time, so only the raw rows of the current page are held.
+
+    Text columns are kept as categoricals per page and joined with union_categoricals, booleans as nullable booleans.
+    Numeric columns are kept at full width until all pages are in, since a page cannot tell which type fits the
+    whole column, and are downcast when the pages are joined, one column at a time."""
+
+    def __init__(self, backend, pd, columns: list):
+        self.backend = backend
+        self.pd = pd
+        self.columns = columns
+        self.pieces = {col['name']: [] for col in columns}
+        self.piece_bytes = {col['name']: 0 for col in columns}
+        self.before = 0     # Memory the 'pandas' backend would use
+        self.peak = 0       # Largest memory held by converted columns at any point (the raw JSON rows are not counted)
+
+    def add(self, rows: list):
+        pd = self.pd
+        page = pd.DataFrame.from_records(data=rows, columns=[col['name'] for col in self.columns])
+        page_bytes = int(page.memory_usage(deep=True, index=False).sum())
+        for col in self.columns:
+            values = page[col['name']]
+            standard = self.backend.convert_column(pd, values, col['dataType'])
+            standard_bytes = standard.memory_usage(deep=True, index=False)
+            self.before += standard_bytes
+            piece = self.backend.compact_page(pd, values, standard, col['dataType'])
+            self.pieces[col['name']].append(piece)
+            self.piece_bytes[col['name']] += piece.memory_usage(deep=True, index=False)
+            self.peak = max(self.peak, sum(self.piece_bytes.values()) + page_bytes + standard_bytes)
+
+    def finish(self):
+        pd = self.pd
+        data = {}
+        after = 0
+        for col in self.columns:
+            pieces = self.pieces.pop(col['name'])
+            joined = self.backend.join_pieces(pd, pieces, col['dataType'])
+            del pieces
+            joined_bytes = joined.memory_usage(deep=True, index=False)
+            column = self.backend.compact_column(pd, joined, col['dataType'])
+            column_bytes = column.memory_usage(deep=True, index=False)
+            self.peak = max(self.peak, sum(self.piece_bytes.values()) + after + joined_bytes + column_bytes)
+            self.piece_bytes[col['name']] = 0
+            after += column_bytes
+            data[col['name']] = column
+
+        df = pd.DataFrame(data, copy=False)
+        df.attrs["memory_savings"] = {"before_bytes": int(self.before), "after_bytes": int(after), "peak_bytes": int(self.peak)}
+        if self.before:
+            logging.info(f"Compact table uses {after / 1024 ** 2:.1f} MiB instead of {self.before / 1024 ** 2:.1f} MiB "
+                         f"({1 - after / self.before:.0%} less), {self.peak / 1024 ** 2:.1f} MiB at most during conversion")
+        return df
+
+
+class CompactPandasBackend(PandasBackend):
+    """pandas DataFrame using less memory than the 'pandas' backend:
+    - Text columns with few distinct values (at most 'category_threshold' of the rows) are categorical
+    - Integer columns use the smallest integer type that holds their values (nullable if there are missing values)
+    - Decimal columns use float32 when that does not change any value
+    - Boolean columns are nullable booleans, so missing values stay missing instead of becoming False
+
+    Pages are converted as they are downloaded (see begin). The memory used before and after and the peak during
+    conversion are logged and stored in the DataFrame's attrs["memory_savings"]."""
+
+    def __init__(self, category_threshold: float = 0.5):
+        self.category_threshold = category_threshold
+
+    def begin(self, columns: list) -> _CompactTableBuilder:
+        pd = require_optional("pandas", "pandas", "The 'pandas_compact' table backend")
+        return _CompactTableBuilder(self, pd, columns)
+
+    def convert(self, columns: list, rows: list):
+        builder = self.begin(columns)
+        builder.add(rows)
+        return builder.finish()
+
+    @staticmethod
+    def compact_page(pd, values, standard, data_type: str):
+        """Representation of one page of a column that can be joined with the other pages."""
+        if data_type == 'Boolean':
+            try:
+                return values.astype("boolean")
+            except (TypeError, ValueError):
+                return standard
+        if data_type == 'Integer' or data_type == 'Decimal':
+            return standard
+        return standard.astype("category")
+
+    @staticmethod
+    def join_pieces(pd, pieces: list, data_type: str):
+        if len(pieces) == 1:
+            return pieces[0]
+        if data_type not in ('Integer', 'Decimal', 'Boolean'):
+            return pd.Series(pd.api.types.union_categoricals(pieces))
+        return pd.concat(pieces, ignore_index=True)
+
+    def compact_column(self, pd, column, data_type: str):
+        """Return the smallest lossless representation of a whole column."""
+        if data_type == 'Integer' or data_type == 'Decimal':
+            if pd.api.types.is_integer_dtype(column):
+                return pd.to_numeric(column, downcast="integer")
+            present = column.dropna()
+            if data_type == 'Integer' and len(present) and (present == present.round()).all():
+                # Missing values force floats in numpy types, so use the pandas nullable integer of the smallest size
+                smallest = pd.to_numeric(present.astype("int64"), downcast="integer").dtype
+                return column.astype(smallest.name.capitalize())
+            narrowed = column.astype("float32")
+            if (narrowed.dropna().astype("float64") == present).all():
+                return narrowed
+            return column
+        if isinstance(column.dtype, pd.CategoricalDtype) and len(column.cat.categories) > self.category_threshold * len(column):
+            # Too many distinct values for a categorical to save memory
+            return column.astype(str)
+        return column
+
+
+class NumpyBackend:
+    """NumPy structured array. Integer columns with missing values become floats so they can hold NaN."""
+
+    def convert(self, columns: list, rows: list):
+        np = require_optional("numpy", "numpy", "The 'numpy' table backend")
+        arrays = []
+        for position, col in enumerate(columns):
+            values = _column_values(rows, position)
+            if col['dataType'] == 'Integer' and None not in values:
+                arrays.append(np.array(values, dtype=np.int64))
+            elif col['dataType'] in ('Integer', 'Decimal'):
+                arrays.append(np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+            elif col['dataType'] == 'Boolean':
+                arrays.append(np.array([bool(v) for v in values], dtype=np.bool_))
+            else:
+                arrays.append(np.array([str(v) for v in values], dtype=np.str_))
+        table = np.empty(len(rows), dtype=[(col['name'], array.dtype) for col, array in zip(columns, arrays)])
+        for col, array in zip(columns, arrays):
+            table[col['name']] = array
+        return table
+
+
+def _integer(value) -> int:
+    """Integer column value as an int. Numbers and numeric strings are accepted if they are whole, e.g. 3, 3.0 or "3"."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f"{value!r} is not an Integer")
+    return int(number)
+
+
+class ArrowBackend:
+    """pyarrow Table. Missing values are kept as nulls.
+    Integer and Decimal values are coerced from numbers or numeric strings; an Integer value with a fraction raises a ValueError."""
+
+    def convert(self, columns: list, rows: list):
+        pa = require_optional("pyarrow", "pyarrow", "The 'arrow' table backend")
+        types = {"Integer": pa.int64(), "Decimal": pa.float64(), "Boolean": pa.bool_()}
+        arrays = {}
+        for position, col in enumerate(columns):
+            values = _column_values(rows, position)
+            data_type = types.get(col['dataType'], pa.string())
+            if data_type == pa.string():
+                values = [None if v is None else str(v) for v in values]
+            elif data_type == pa.int64():
+                values = [None if v is None else _integer(v) for v in values]
+            elif data_type == pa.float64():
+                values = [None if v is None else float(v) for v in values]
+            arrays[col['name']] = pa.array(values, type=data_type)
+        return pa.table(arrays)
+
+
+class PolarsBackend:
+    """polars DataFrame. Missing values are kept as nulls."""
+
+    def convert(self, columns: list, rows: list):
+        pl = require_optional("polars", "polars", "The 'polars' table backend")
+        types = {"Integer": pl.Int64, "Decimal": pl.Float64, "Boolean": pl.Boolean}
+        series = []
+        for position, col in enumerate(columns):
+            values = _column_values(rows, position)
+            data_type = types.get(col['dataType'], pl.Utf8)
+            if data_type == pl.Utf8:
+                values = [None if v is None else str(v) for v in values]
+            series.append(pl.Series(col['name'], values, dtype=data_type, strict=False))
+        return pl.DataFrame(series)
+
+
+backends = {
+    "pandas": PandasBackend(),
+    "pandas_compact": CompactPandasBackend(),
+    "numpy": NumpyBackend(),
+    "arrow": ArrowBackend(),
+    "polars": PolarsBackend(),
+}
+
+
+def register_backend(name: str, backend):
+    """Add a backend. It needs a 'convert(columns, rows)' method, and can have a 'begin(columns)' method to convert page by page."""
+    backends[name] = backend
+
+
+def get_backend(name: str):
+    if name not in backends:
+        raise ValueError(f"Unknown table backend '{name}'. Available backends: {', '.join(backends)}")
+    return backends[name]
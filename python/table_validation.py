@@ -0,0 +1,193 @@
+import csv
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import slope_api
+from table_backends import require_optional
+
+# Checks data table files against their table structure before they are uploaded, so a malformed file fails here
+# instead of after a full upload and a failed table creation in SLOPE.
+#
+# Files are read in chunks of rows with pandas and every check works on whole columns of a chunk at once.
+
+boolean_values = {"true", "false", "1", "0"}
+
+
+class TableValidationError(Exception):
+    def __init__(self, problems: list):
+        self.problems = problems
+        super().__init__(f"{len(problems)} problem(s) found:\n" + "\n".join(problems))
+
+
+class TableValidator:
+    """Validates local data table files against the columns of their table structure:
+    - The file has every structure column and no others
+    - Integer, Decimal and Boolean columns only contain values of that type
+    - Index columns have no missing values and no duplicated combination of values
+
+    Table structure columns are fetched once per structure and cached, so one validator can check a whole batch.
+    A structure that cannot be fetched is reported as a problem of every file that uses it, and is not fetched again.
+
+    Usage:
+        validator = TableValidator(api)
+        validator.validate(filename, data_table_parameters)          # Raises TableValidationError
+        validator.validate_batch([{"path": ..., "params": ...}, ...])  # All files in parallel
+    """
+
+    def __init__(self, api: slope_api.SlopeApi, chunk_size: int = 100000, max_problems: int = 20):
+        self.api = api
+        self.chunk_size = chunk_size
+        self.max_problems = max_problems    # Stop reading a file once this many problems are found
+        self.__columns = {}
+        self.__errors = {}      # Table structure ID: exception raised fetching it
+        self.__lock = threading.Lock()
+
+    def structure_columns(self, table_structure_id: int) -> list:
+        with self.__lock:
+            columns = self.__columns.get(table_structure_id)
+            error = self.__errors.get(table_structure_id)
+        if error is not None:
+            raise error
+        if columns is None:
+            try:
+                columns = self.api.get_table_structure_columns(table_structure_id)
+            except requests.RequestException as e:
+                with self.__lock:
+                    self.__errors[table_structure_id] = e
+                raise
+            with self.__lock:
+                self.__columns[table_structure_id] = columns
+        return columns
+
+    def __prefetch(self, table_structure_id: int):
+        try:
+            self.structure_columns(table_structure_id)
+        except requests.RequestException:
+            pass    # Reported by check() for each file using the structure
+
+    def __read_chunks(self, filename: str, params: dict):
+        pd = require_optional("pandas", "pandas", "Validating data tables")
+        # Everything is read as text so the type checks see the values as they are written in the file
+        if params.get("excelSheetName"):
+            yield pd.read_excel(filename, sheet_name=params["excelSheetName"], dtype=str)
+            return
+        # index_col=False stops pandas from turning leading fields into the index when rows have more fields than the header
+        yield from pd.read_csv(filename, sep=params.get("delimiter", ","), dtype=str, chunksize=self.chunk_size, index_col=False,
+                               skipinitialspace=True, encoding="utf-8-sig")
+
+    @staticmethod
+    def __check_field_count(filename: str, params: dict) -> list:
+        """pandas drops extra fields on the first data row with only a warning (a trailing delimiter on every row, for
+        example), so compare it with the header here. Later rows with extra fields make pandas raise a ParserError."""
+        if params.get("excelSheetName"):
+            return []
+        with open(filename, newline="", encoding="utf-8-sig") as file:
+            reader = csv.reader(file, delimiter=params.get("delimiter", ","))
+            header = next(reader, [])
+            first_row = next(reader, None)
+        if first_row is not None and len(first_row) > len(header):
+            return [f"Line 2 has {len(first_row)} fields but the header has {len(header)}"]
+        return []
+
+    @staticmethod
+    def __rows(mask, first_line: int) -> str:
+        lines = [str(first_line + position) for position in mask.to_numpy().nonzero()[0][:5]]
+        more = " ..." if int(mask.sum()) > len(lines) else ""
+        return ", ".join(lines) + more
+
+    def __check_types(self, pd, chunk, columns: list, first_line: int) -> list:
+        problems = []
+        for col in columns:
+            values = chunk[col["name"]]
+            present = values.notna()
+            if col["dataType"] in ("Integer", "Decimal"):
+                numbers = pd.to_numeric(values, errors="coerce")
+                bad = present & numbers.isna()
+                if col["dataType"] == "Integer":
+                    bad |= numbers.notna() & (numbers % 1 != 0)
+            elif col["dataType"] == "Boolean":
+                bad = present & ~values.str.strip().str.lower().isin(boolean_values)
+            else:
+                continue
+            if bad.any():
+                problems.append(f"Column '{col['name']}' has values that are not {col['dataType']} on lines {self.__rows(bad, first_line)}")
+        return problems
+
+    def __check_contents(self, pd, filename: str, slope_table_params: dict, columns: list) -> list:
+        names = [col["name"] for col in columns]
+        index_names = [col["name"] for col in columns if col.get("isIndex")]
+        problems = []
+        index_hashes = []
+        first_line = 2      # Line 1 is the header
+
+        for chunk in self.__read_chunks(filename, slope_table_params):
+            chunk.columns = [str(name).strip() for name in chunk.columns]
+            if first_line == 2:
+                # The header only needs checking once, and nothing else can be checked if it is wrong
+                missing = [name for name in names if name not in chunk.columns]
+                extra = [name for name in chunk.columns if name not in names]
+                if missing:
+                    problems.append(f"Missing columns: {missing}")
+                if extra:
+                    problems.append(f"Columns not in the table structure: {extra}")
+                if problems:
+                    break
+
+            problems += self.__check_types(pd, chunk, columns, first_line)
+            if index_names:
+                missing_index = chunk[index_names].isna().any(axis=1)
+                if missing_index.any():
+                    problems.append(f"Index columns {index_names} have missing values on lines {self.__rows(missing_index, first_line)}")
+                index_hashes.append(pd.util.hash_pandas_object(chunk[index_names], index=False))
+            first_line += len(chunk)
+            if len(problems) >= self.max_problems:
+                break
+
+        if index_hashes and len(problems) < self.max_problems:
+            # Duplicates can be in different chunks, so they are found from the hashes of all index values
+            hashes = pd.concat(index_hashes, ignore_index=True)
+            duplicated = hashes.duplicated(keep=False)
+            if duplicated.any():
+                problems.append(f"Index columns {index_names} have duplicated values on lines {self.__rows(duplicated, 2)}")
+        return problems
+
+    def check(self, filename: str, slope_table_params: dict) -> list:
+        """Return the problems found in a data table file. An empty list means the file matches its table structure.
+        A file that cannot be read or parsed, or whose table structure cannot be fetched, is reported as a problem rather
+        than raised, so a batch still checks the other files."""
+        pd = require_optional("pandas", "pandas", "Validating data tables")
+        with self.api.tracer.span("validate_table", "validation", file=os.path.basename(filename)):
+            try:
+                columns = self.structure_columns(slope_table_params["tableStructureId"])
+            except requests.RequestException as e:
+                return [f"Could not get table structure {slope_table_params['tableStructureId']}: {e}"]
+            try:
+                problems = self.__check_field_count(filename, slope_table_params)
+                if not problems:
+                    problems = self.__check_contents(pd, filename, slope_table_params, columns)
+            except (pd.errors.ParserError, OSError, ValueError) as e:
+                problems = [f"Could not read the file: {e}".strip()]
+        return problems[:self.max_problems]
+
+    def validate(self, filename: str, slope_table_params: dict):
+        """Raise a TableValidationError if the file does not match its table structure."""
+        problems = self.check(filename, slope_table_params)
+        if problems:
+            raise TableValidationError([f"'{filename}': {problem}" for problem in problems])
+        logging.debug(f"'{filename}' matches table structure {slope_table_params['tableStructureId']}")
+
+    def validate_batch(self, uploads: list, max_workers: int = 8):
+        """Validate many files in parallel. 'uploads' is a list of {"path": local file, "params": data table parameters}.
+        Every file is checked and a single TableValidationError lists the problems of all of them."""
+        structure_ids = {upload["params"]["tableStructureId"] for upload in uploads}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Fetch each structure once up front rather than from several threads at the same time
+            list(executor.map(self.__prefetch, structure_ids))
+            results = list(executor.map(lambda upload: self.check(upload["path"], upload["params"]), uploads))
+
+        problems = [f"'{upload['path']}': {problem}" for upload, file_problems in zip(uploads, results) for problem in file_problems]
+        if problems:
+            raise TableValidationError(problems)
+        logging.info(f"Validated {len(uploads)} data table files")
@@ -0,0 +1,98 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer:
+    """Collects nested timing spans and exports them in the Chrome trace-event format.
+
+    The exported file can be opened in chrome://tracing or https://ui.perfetto.dev.
+    Spans on the same thread nest by time, so wrapping a high level step around lower level
+    API calls shows each phase and the calls inside of it."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.__events = []
+        self.__thread_names = {}
+        self.__lock = threading.Lock()
+        self.__start_ns = time.perf_counter_ns()
+
+    def __now_us(self) -> float:
+        return (time.perf_counter_ns() - self.__start_ns) / 1000
+
+    def __record(self, event: dict):
+        thread = threading.current_thread()
+        event["pid"] = os.getpid()
+        event["tid"] = thread.ident
+        with self.__lock:
+            self.__thread_names.setdefault(thread.ident, thread.name)
+            self.__events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str = "slope", **args):
+        """Time the enclosed block and record it as a complete ('X') event."""
+        if not self.enabled:
+            yield
+            return
+
+        start = self.__now_us()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = repr(e)
+            raise
+        finally:
+            event = {"name": name, "cat": category, "ph": "X", "ts": start, "dur": self.__now_us() - start}
+            if args:
+                event["args"] = {key: str(value) for key, value in args.items()}
+            self.__record(event)
+
+    def instant(self, name: str, category: str = "slope", **args):
+        """Record a point in time event, e.g. a status observed while polling."""
+        if not self.enabled:
+            return
+        event = {"name": name, "cat": category, "ph": "i", "s": "t", "ts": self.__now_us()}
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        self.__record(event)
+
+    def clear(self):
+        """Remove all recorded events."""
+        with self.__lock:
+            self.__events.clear()
+            self.__thread_names.clear()
+
+    def events(self) -> list:
+        """Return the recorded events including thread name metadata, in trace-event format."""
+        with self.__lock:
+            events = list(self.__events)
+            thread_names = dict(self.__thread_names)
+        pid = os.getpid()
+        metadata = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in thread_names.items()]
+        return metadata + events
+
+    def export_chrome_trace(self, filename: str):
+        """Write all recorded events to a JSON file that can be loaded into a trace viewer."""
+        with open(filename, "w") as file:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, file)
+
+
+def traced(name: str = None, category: str = "api"):
+    """Decorator for methods of objects with a 'tracer' attribute. Records each call as a span."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.span(span_name, category):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Shared tracer used by SlopeApi when no tracer is given. It is disabled until a script turns it on.
+default_tracer = Tracer(enabled=False)
@@ -0,0 +1,123 @@
+import collections
+import logging
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+# Transfers to and from presigned storage URLs (file uploads and report downloads).
+# These do not use the SLOPE session because they must not send its authorization header, but they still
+# share a pooled session so uploading many small files reuses connections instead of opening one per file.
+
+
+@dataclass(frozen=True, slots=True)
+class TransferStats:
+    """Timing of one upload or download."""
+    direction: str      # "upload" or "download"
+    filename: str
+    bytes: int
+    seconds: float
+    status_code: int
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / 1024 ** 2 / self.seconds if self.seconds else 0.0
+
+
+class _TunedAdapter(HTTPAdapter):
+    """HTTPAdapter that sets socket options on every connection it opens."""
+
+    def __init__(self, socket_options: list, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+
+
+class TransferClient:
+    """Pooled HTTP client for presigned upload and download URLs.
+
+    pool_size: Connections kept open per host. Set it to the number of transfers that run at the same time.
+    connect_timeout, read_timeout: Seconds to wait for a connection and between bytes received.
+    socket_buffer_bytes: Socket send and receive buffer size. None keeps the operating system default.
+    chunk_size: Bytes read at a time when streaming a download to disk.
+
+    Statistics of the most recent transfers are kept in 'history'; summary() totals them."""
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 10, read_timeout: float = 300,
+                 socket_buffer_bytes: int = None, chunk_size: int = 1024 * 1024, history_size: int = 1000):
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_size = chunk_size
+        self.history = collections.deque(maxlen=history_size)
+        self.__lock = threading.Lock()
+
+        socket_options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        if socket_buffer_bytes:
+            socket_options += [(socket.SOL_SOCKET, socket.SO_SNDBUF, socket_buffer_bytes),
+                               (socket.SOL_SOCKET, socket.SO_RCVBUF, socket_buffer_bytes)]
+        adapter = _TunedAdapter(socket_options, pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __record(self, stats: TransferStats):
+        with self.__lock:
+            self.history.append(stats)
+        logging.debug(f"{stats.direction.capitalize()} of '{stats.filename}': {stats.bytes} bytes in {stats.seconds:.2f} seconds "
+                      f"({stats.megabytes_per_second:.1f} MiB/s)")
+
+    def upload(self, url: str, filename: str, check_response=None) -> TransferStats:
+        """PUT a local file to a presigned URL. 'check_response' is called with the response before raising for errors."""
+        size = os.path.getsize(filename)
+        start = time.perf_counter()
+        with open(filename, "rb") as file:
+            response = self.session.put(url, data=file, headers={"Content-Length": str(size)}, timeout=self.timeout)
+        stats = TransferStats("upload", filename, size, time.perf_counter() - start, response.status_code)
+        if check_response is not None:
+            check_response(response)
+        response.raise_for_status()
+        self.__record(stats)
+        return stats
+
+    def download(self, url: str, filename: str, check_response=None) -> TransferStats:
+        """GET a presigned URL and stream it to a local file without holding the whole file in memory.
+        The file is written to a temporary file first, so an interrupted download never leaves a partial file behind."""
+        start = time.perf_counter()
+        size = 0
+        temp_path = filename + ".tmp"
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if check_response is not None:
+                check_response(response)
+            response.raise_for_status()
+            try:
+                with open(temp_path, "wb") as file:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        file.write(chunk)
+                        size += len(chunk)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        os.replace(temp_path, filename)
+        stats = TransferStats("download", filename, size, time.perf_counter() - start, response.status_code)
+        self.__record(stats)
+        return stats
+
+    def summary(self) -> dict:
+        """Totals of the transfers in 'history' by direction."""
+        with self.__lock:
+            history = list(self.history)
+        summary = {}
+        for direction in ("upload", "download"):
+            transfers = [stats for stats in history if stats.direction == direction]
+            total_bytes = sum(stats.bytes for stats in transfers)
+            total_seconds = sum(stats.seconds for stats in transfers)
+            summary[direction] = {"count": len(transfers), "bytes": total_bytes, "seconds": total_seconds,
+                                  "megabytes_per_second": total_bytes / 1024 ** 2 / total_seconds if total_seconds else 0.0}
+        return summary